@@ -1,37 +1,181 @@
 import asyncio
-from collections import deque
+import logging
+import os
+import time
+from functools import partial
+from task_context import set_task_context
+from task_journal import NullTaskJournal, create_journal
+from task_scheduler import TaskScheduler, get_artist_id
+from task_store import TaskStatusStore
 
-task_queue = deque()
-task_status = {}
-semaphore = asyncio.Semaphore(20)
+logger = logging.getLogger(__name__)
 
-async def broadcast_status(manager, task_id, status):
-    task_status[task_id] = status
-    await manager.broadcast({"task_id": task_id, "status": status})
+# 동시에 실행할 워커 수
+WORKER_COUNT = int(os.getenv("TASK_WORKER_COUNT", "20"))
 
+# 작업 유형별 동시 실행 제한 (없는 유형은 WORKER_COUNT까지 허용)
+TASK_TYPE_LIMITS = {
+    "crawling-artist": 10,
+    "crawling-albums": 5,
+    "crawling-songs": 3,
+    "crawling-videos": 5,
+    "crawling-photos": 5,
+    "crawling-comments": 2,
+    "crawling-all": 2,
+}
+
+# 완료된 작업 결과를 재사용할 시간(초), 0이면 완료된 작업은 재사용하지 않음
+COALESCE_WINDOW = float(os.getenv("TASK_COALESCE_WINDOW", "0"))
+
+# 저널에 완료/실패 기록을 남겨 두는 시간(초), 재시작할 때 이보다 오래된 기록만 삭제
+# 갱신 스케줄러가 마지막 완료 시각으로 갱신 여부를 판단하므로 가장 긴 갱신 주기(포토, 7일)보다 길어야 함
+JOURNAL_RETENTION = float(os.getenv("TASK_JOURNAL_RETENTION", str(8 * 86400)))
+
+task_queue = TaskScheduler(TASK_TYPE_LIMITS, WORKER_COUNT)
+task_status = TaskStatusStore()
+workers = []
+# start_worker()에서 create_journal()로 만듦 (import만으로 저널 파일이 생기지 않도록), 그 전에는 기록하지 않음
+journal = NullTaskJournal()
+_journal_set = False
+journal_task = None
+_manager = None
+
+# 상태 변경을 구독자 전송 대기열에 넣기만 하므로 웹소켓 I/O를 기다리지 않음
+def broadcast_status(manager, task_id, status, error=None):
+    task_status.set_status(task_id, status, error=error)
+    if manager is not None:
+        manager.publish({"task_id": task_id, "artist_id": get_artist_id(task_id), "status": status})
+
+# task_context.report_progress가 호출: 진행률을 저장하고 publish면 구독자에게 전송
+def store_progress(task_id, artist_id, progress, publish):
+    task_status.update(task_id, progress=progress)
+    if publish and _manager is not None:
+        message = {"task_id": task_id, "artist_id": artist_id, "status": "in_progress", "progress": progress}
+        _manager.publish(message)
+
+# task_context.report_result가 호출: 결과 요약(누락된 통계 수 등)을 작업 정보의 result에 기록
+def store_result(task_id, detail):
+    record = task_status.get(task_id)
+    if record is not None:
+        task_status.update(task_id, result={**(record.get("result") or {}), **detail})
+
+async def run_task(manager, task_id, task_func, task_args):
+    artist_id = get_artist_id(task_id)
+    set_task_context(task_id, artist_id, partial(store_progress, task_id, artist_id), partial(store_result, task_id))
+    try:
+        journal.record_start(task_id)
+        broadcast_status(manager, task_id, "in_progress")
+        await task_func(*task_args)
+        journal.record_finish(task_id, "completed")
+        broadcast_status(manager, task_id, "completed")
+    except Exception as e:
+        journal.record_finish(task_id, "failed", error=str(e))
+        broadcast_status(manager, task_id, "failed", error=str(e))
+        logger.error(f"Task {task_id} failed: {str(e)}")
+
+# 스케줄러가 우선순위/아티스트 순서와 유형별 동시 실행 제한을 고려해 작업을 넘겨줌
 async def worker():
-    from main import manager
     while True:
-        if task_queue:
-            task_id, task_func, task_args = task_queue.popleft()
-            async with semaphore:
-                try:
-                    await broadcast_status(manager, task_id, "in_progress")
-                    await task_func(*task_args)
-                    await broadcast_status(manager, task_id, "completed")
-                except Exception as e:
-                    task_status[task_id] = "failed"
-                    await broadcast_status(manager, task_id, "failed")
-                    print(f"Task {task_id} failed: {str(e)}")
-        await asyncio.sleep(0.5)
+        task_id, task_func, task_args, enqueued_at = await task_queue.get()
+        try:
+            await run_task(_manager, task_id, task_func, task_args)
+        finally:
+            task_queue.task_done(task_id)
 
+# 같은 task_id가 대기/실행 중이거나 COALESCE_WINDOW 안에 완료됐다면 새로 큐에 넣지 않고 기존 상태를 반환
 def add_task(task_id, task_func, *task_args):
-    task_queue.append((task_id, task_func, task_args))
-    task_status[task_id] = "queued"
+    record = task_status.get(task_id)
+    if record:
+        if record["status"] in ("queued", "in_progress"):
+            return record["status"]
+        if record["status"] == "completed" and time.time() - record["finished_at"] < COALESCE_WINDOW:
+            return record["status"]
+
+    task_status.set_status(task_id, "queued")
+    journal.record_enqueue(task_id, task_func, task_args)
+    task_queue.put((task_id, task_func, task_args, time.monotonic()))
+    return "queued"
+
+# 메모리에 없으면 저널에서 조회 (SQLite 조회는 이벤트 루프 밖에서 실행)
+async def call_status(task_id):
+    status = task_status.get_status(task_id) or await asyncio.to_thread(journal.get_status, task_id)
+    return status or "not_found"
+
+# 작업별 마지막 완료 시각 {task_id: finished_at} (메모리에 없으면 저널에서 한 번에 조회)
+async def get_completed_times(task_ids):
+    completed = await asyncio.to_thread(journal.get_finished_at_many, task_ids)
+    for task_id in task_ids:
+        record = task_status.get(task_id)
+        if record and record["status"] == "completed":
+            completed[task_id] = record["finished_at"]
+    return completed
 
-def call_status(task_id):
-    return task_status.get(task_id, "not_found")
+# 상태와 함께 시작/종료 시각, 오류 메시지 반환
+def get_task_info(task_id):
+    record = task_status.get(task_id)
+    return dict(record) if record else None
 
-def start_worker():
+# 우선순위 클래스별 대기 작업 수와 대기시간 백분위수
+def queue_stats():
+    return {
+        "queued": task_queue.qsize(),
+        "workers": len(workers),
+        "running": dict(+task_queue.running),
+        "classes": task_queue.stats(),
+    }
+
+def set_journal(new_journal):
+    global journal, _journal_set
+    journal = new_journal
+    _journal_set = True
+
+# 재시작 전에 끝나지 않은 작업을 저널에서 다시 큐에 넣고 워커 시작
+def start_worker(manager=None, worker_count=None):
+    global _manager, journal_task
+    _manager = manager
     loop = asyncio.get_event_loop()
-    loop.create_task(worker())
\ No newline at end of file
+
+    if not _journal_set:
+        set_journal(create_journal())
+    journal.purge(max(task_status.retention, JOURNAL_RETENTION))
+    replayed = journal.load_unfinished()
+    for task_id, task_func, task_args in replayed:
+        add_task(task_id, task_func, *task_args)
+    if replayed:
+        logger.info(f"Replayed {len(replayed)} unfinished tasks from journal")
+
+    journal_task = loop.create_task(journal.run())
+    for _ in range(worker_count or WORKER_COUNT):
+        workers.append(loop.create_task(worker()))
+
+# 큐 처리량 및 대기시간 벤치마크 (python async_processor.py)
+async def benchmark(task_count=2000, task_duration=0.01):
+    import tempfile
+    from task_journal import SQLiteTaskJournal
+
+    async def dummy_task():
+        await asyncio.sleep(task_duration)
+
+    task_types = ["crawling-artist", "crawling-songs", "crawling-comments"]
+
+    journal_dir = tempfile.mkdtemp()
+    set_journal(SQLiteTaskJournal(os.path.join(journal_dir, "benchmark_journal.db")))
+    start_worker()
+    started = time.monotonic()
+    for i in range(task_count):
+        add_task(f"{task_types[i % len(task_types)]}-{i % 50}-{i}", dummy_task)
+    enqueue_elapsed = time.monotonic() - started
+    await task_queue.join()
+    elapsed = time.monotonic() - started
+
+    stats = queue_stats()
+    print(f"{task_count} tasks with {stats['workers']} workers in {elapsed:.2f}s ({task_count / elapsed:.1f} tasks/s)")
+    print(f"enqueue with journaling: {enqueue_elapsed / task_count * 1e6:.1f}us per task")
+    for priority, class_stats in stats["classes"].items():
+        print(f"[{priority}] wait p50 {class_stats['wait_p50'] * 1000:.1f}ms, p95 {class_stats['wait_p95'] * 1000:.1f}ms, p99 {class_stats['wait_p99'] * 1000:.1f}ms")
+
+    for w in workers + [journal_task]:
+        w.cancel()
+
+if __name__ == "__main__":
+    asyncio.run(benchmark())
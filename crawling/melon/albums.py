@@ -1,10 +1,9 @@
-import httpx
-from bs4 import BeautifulSoup
-from fastapi import HTTPException
 import logging
 import asyncio
-from datetime import datetime
-import random
+from crawling.melon.cache import parse_cached
+from crawling.melon.client import fetch, fetch_cached
+from crawling.melon.retry import CrawlerError
+from crawling.melon.parsers import parse_album_list
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
@@ -20,23 +19,16 @@ user_agents = [
 
 # HTTP 요청 비동기 함수
 async def fetch_response(url: str, params: dict, headers: dict) -> dict:
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, params=params, headers=headers)
-            response.raise_for_status()
-
-            try:
-                return response.json()
-            except ValueError as json_error:
-                return response.text
-
-        except httpx.HTTPStatusError as http_error:
-            logger.error(f"HTTP error occurred: {http_error}")
-            raise HTTPException(status_code=500, detail=f"HTTP error occurred: {http_error}")
-        
-        except Exception as e:
-            logger.error(f"Unexpected error occurred: {e}")
-            raise HTTPException(status_code=500, detail="Unexpected error occurred while fetching data")
+    try:
+        response = await fetch(url, params=params, headers=headers)
+    except CrawlerError as e:
+        logger.error(f"Failed to fetch {url}: {e}")
+        raise
+
+    try:
+        return response.json()
+    except ValueError as json_error:
+        return response.text
         
 
 # 앨범별 좋아요 수 크롤링 함수
@@ -80,60 +72,11 @@ async def get_albums(artist_id: str) -> dict:
 
     # 아티스트의 앨범 목록 크롤링
     logger.info("Fetching album list...")
-    paging_songs = await fetch_response(paging_url, paging_query, melon_headers)
-
-    paging_response = BeautifulSoup(paging_songs, 'html.parser')
-    albums = []
-    album_ids = []
-    release_dates = []
+    paging_response = await fetch_cached(paging_url, params=paging_query, headers=melon_headers)
 
-    for album_li in paging_response.select('li.album11_li'):
-        album = {}
-        
-        # 앨범 ID 추출
-        album_link = album_li.find('a', class_='thumb')
-        if album_link:
-            album_id = album_link['href'].split("'")[1]
-            album['id'] = album_id
-            album_ids.append(album_id)
-            
-        # 앨범명 추출
-        album_name_tag = album_li.find('a', class_='ellipsis')
-        album['album_name'] = album_name_tag.text if album_name_tag else 'N/A'
-        
-        # 아티스트명 추출
-        artist_name_tag = album_li.find('a', class_='play_artist')
-        album['artist_name'] = artist_name_tag.text if artist_name_tag else 'Various Artists'
-        
-        # 앨범 발매일 추출
-        release_date_tag = album_li.find('span', class_='cnt_view')
-        if release_date_tag and release_date_tag.text:
-            try:
-                release_date = release_date_tag.text
-                release_dates.append(datetime.strptime(release_date, "%Y.%m.%d"))
-                album['release_date'] = release_date
-            except ValueError:
-                logger.warning(f"Invalid date format for album {album_id}: {release_date}")
-                album['release_date'] = 'N/A'
-        else:
-            album['release_date'] = 'N/A'
-        
-        # 앨범 이미지 URL 추출
-        album_image_tag = album_li.find('img')
-        album['album_image_url'] = album_image_tag['src'] if album_image_tag else 'N/A'
-        
-        # 좋아요 수 추출
-        like_count_tag = album_li.find('strong', class_='none')
-        album['like_count'] = like_count_tag.next_sibling.strip() if like_count_tag else '0'
-        
-        # 곡 수 추출
-        total_songs_tag = album_li.find('span', class_='tot_song')
-        album['total_songs'] = int(total_songs_tag.text.replace('곡','')) if total_songs_tag else 0
+    # 목록이 이전 크롤링과 같으면 파싱 결과를 재사용
+    albums, album_ids = await parse_cached(parse_album_list, paging_response, artist_id)
 
-        album['artist_id'] = artist_id
-        
-        albums.append(album)
-    
     # 앨범별 좋아요 수 가져오기
     likes_for_albums = await fetch_album_likes(album_ids, melon_headers)
     for album in albums:
@@ -1,12 +1,10 @@
-import aiohttp
-from aiohttp import TCPConnector, ClientSession
-import asyncio
 from bs4 import BeautifulSoup
 import random
 from urllib.parse import urlparse, parse_qs
 import logging
-import time
 from typing import Optional, Dict
+from crawling.melon.client import fetch, fetch_cached
+from crawling.melon.retry import CrawlerError
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
@@ -77,90 +75,80 @@ def extract_info(section):
 def extract_awards(section):
     return [dd.get_text(strip=True) for dd in section.find_all("dd")]
 
+# 아티스트 정보 크롤링 작업에 넘기는 URL (/crawling/melon/artist_info 요청과 같은 timeline.htm 형식)
+# task_id가 같아야 엔드포인트, 전체 크롤링, 갱신 스케줄러의 중복 작업이 합쳐짐
+def artist_url(artist_id) -> str:
+    return f"https://www.melon.com/artist/timeline.htm?artistId={artist_id}"
+
 # 아티스트 정보를 크롤링하는 함수
-async def get_artist_info(url: str, max_retries=20, delay=0.5) -> Optional[Dict[str, Optional[str]]]:
-    attempt = 0
-
-    while attempt < max_retries:
-        try:
-            logger.info(f"Attempt {attempt + 1} of {max_retries} - Starting to crawl artist information from URL: {url}")
-
-            parsed_url = urlparse(url)
-            query_params = parse_qs(parsed_url.query)
-            artist_id = query_params.get("artistId", [None])[0]
-            
-            if not artist_id:
-                logger.error("Invalid URL: artistId not found")
-                raise ValueError("Invalid URL: artistId not found")
-            
-            detail_url = f"https://www.melon.com/artist/detail.htm?artistId={artist_id}"
-
-            user_agent = random.choice(user_agents)
-            headers = {'User-Agent': user_agent}
-
-            connector = TCPConnector(ssl=False)
-            async with ClientSession(connector=connector) as session:
-                async with session.get(detail_url, headers=headers) as response:
-                    response.raise_for_status()
-                    logger.info("Successfully fetched artist page")
-                    content = await response.read()
-                    soup = BeautifulSoup(content, "html.parser")
-
-                    artist = {}
-                    artist['id'] = artist_id
-
-                    # 아티스트 이름
-                    artist_name_tag = soup.find("p", class_="title_atist")
-                    artist['artist_name'] = artist_name_tag.contents[1].strip() if artist_name_tag else None
-                
-                    # 프로필 이미지
-                    wrap_thumb_div = soup.find("div", class_="wrap_thumb")
-
-                    if wrap_thumb_div:
-                        profile_img_tag = wrap_thumb_div.find("img")
-                        if profile_img_tag and profile_img_tag.has_attr('src'):
-                            artist['img'] = profile_img_tag['src']
-                        else:
-                            artist['img'] = None
-                    else:
-                        artist['img'] = None
-
-                    # 수상이력
-                    award_section = soup.find("div", id="d_artist_award")
-                    if award_section:
-                        artist['awards'] = extract_awards(award_section)
-
-                    # 소개
-                    intro_section = soup.find("div", id="d_artist_intro")
-                    if intro_section:
-                        artist['artist_intro'] = intro_section.get_text(strip=True)
-
-                    # 활동정보
-                    activity_section = soup.find("div", class_="section_atistinfo03")
-                    if activity_section:
-                        artist.update(extract_info(activity_section))
-
-                    # 신상정보
-                    info_section = soup.find("div", class_="section_atistinfo04")
-                    if info_section:
-                        artist.update(extract_info(info_section))
-
-                    # 팬맺기 수
-                    fan_url = f"https://www.melon.com/artist/getArtistFanNTemper.json?artistId={artist_id}"
-                    async with session.get(fan_url, headers=headers) as fan_response:
-                        if fan_response.status == 200:
-                            fan_data = await fan_response.json()
-                            artist['followers'] = fan_data.get('fanInfo', {}).get('SUMMCNT', 0)
-                        else:
-                            logger.error(f"Failed to fetch fan count data: HTTP {fan_response.status}")
-                            artist['followers'] = 0
-
-                    return artist
-
-        except aiohttp.ClientError as e:
-            attempt += 1
-            logger.error(f"Attempt {attempt} failed: {e}")
-            if attempt < max_retries:
-                await asyncio.sleep(delay)
-            else:
-                raise Exception(f"Failed to fetch page after {max_retries} attempts: {e}")
+async def get_artist_info(url: str) -> Optional[Dict[str, Optional[str]]]:
+    logger.info(f"Starting to crawl artist information from URL: {url}")
+
+    parsed_url = urlparse(url)
+    query_params = parse_qs(parsed_url.query)
+    artist_id = query_params.get("artistId", [None])[0]
+    
+    if not artist_id:
+        logger.error("Invalid URL: artistId not found")
+        raise ValueError("Invalid URL: artistId not found")
+    
+    detail_url = f"https://www.melon.com/artist/detail.htm?artistId={artist_id}"
+
+    user_agent = random.choice(user_agents)
+    headers = {'User-Agent': user_agent}
+
+    response = await fetch_cached(detail_url, headers=headers)
+    logger.info("Successfully fetched artist page")
+    content = response.content
+    soup = BeautifulSoup(content, "html.parser")
+
+    artist = {}
+    artist['id'] = artist_id
+
+    # 아티스트 이름
+    artist_name_tag = soup.find("p", class_="title_atist")
+    artist['artist_name'] = artist_name_tag.contents[1].strip() if artist_name_tag else None
+        
+    # 프로필 이미지
+    wrap_thumb_div = soup.find("div", class_="wrap_thumb")
+
+    if wrap_thumb_div:
+        profile_img_tag = wrap_thumb_div.find("img")
+        if profile_img_tag and profile_img_tag.has_attr('src'):
+            artist['img'] = profile_img_tag['src']
+        else:
+            artist['img'] = None
+    else:
+        artist['img'] = None
+
+    # 수상이력
+    award_section = soup.find("div", id="d_artist_award")
+    if award_section:
+        artist['awards'] = extract_awards(award_section)
+
+    # 소개
+    intro_section = soup.find("div", id="d_artist_intro")
+    if intro_section:
+        artist['artist_intro'] = intro_section.get_text(strip=True)
+
+    # 활동정보
+    activity_section = soup.find("div", class_="section_atistinfo03")
+    if activity_section:
+        artist.update(extract_info(activity_section))
+
+    # 신상정보
+    info_section = soup.find("div", class_="section_atistinfo04")
+    if info_section:
+        artist.update(extract_info(info_section))
+
+    # 팬맺기 수
+    fan_url = f"https://www.melon.com/artist/getArtistFanNTemper.json?artistId={artist_id}"
+    try:
+        fan_response = await fetch(fan_url, headers=headers)
+        fan_data = fan_response.json()
+        artist['followers'] = fan_data.get('fanInfo', {}).get('SUMMCNT', 0)
+    except CrawlerError as e:
+        logger.error(f"Failed to fetch fan count data: {e}")
+        artist['followers'] = 0
+
+    return artist
@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import httpx
+from process_pool import run_in_process
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 응답 캐시 설정 (본문은 내용 해시로 저장해 같은 응답은 한 번만 저장)
+MELON_CACHE_ENABLED = os.getenv("MELON_CACHE_ENABLED", "1") == "1"
+MELON_CACHE_DIR = os.getenv("MELON_CACHE_DIR", ".melon_cache")
+MELON_CACHE_MAX_BYTES = int(os.getenv("MELON_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# 엔드포인트별 캐시 유지 시간(초), 목록에 없는 엔드포인트(좋아요/스트리밍 수, 댓글)는 캐시하지 않음
+# 유지 시간이 지나면 ETag/Last-Modified로 재검증하고, 바뀌지 않았으면 본문을 다시 받지 않음
+CACHE_TTLS = {
+    "/artist/detail.htm": float(os.getenv("MELON_CACHE_TTL_ARTIST", "86400")),
+    "/artist/albumPaging.htm": float(os.getenv("MELON_CACHE_TTL_ALBUMS", "21600")),
+    "/artist/songPaging.htm": float(os.getenv("MELON_CACHE_TTL_SONGS", "21600")),
+    "/artist/videoPaging.htm": float(os.getenv("MELON_CACHE_TTL_VIDEOS", "21600")),
+    "/artist/photoPaging.htm": float(os.getenv("MELON_CACHE_TTL_PHOTOS", "21600")),
+}
+
+def cache_ttl(url: str):
+    return CACHE_TTLS.get(httpx.URL(url).path)
+
+# URL + 정렬된 쿼리 파라미터로 캐시 키 생성
+def cache_key(url: str, params=None) -> str:
+    full_url = httpx.URL(url).copy_merge_params(params or {})
+    query = sorted(full_url.params.multi_items())
+    return hashlib.sha256(f"{full_url.copy_with(query=None)}?{query}".encode()).hexdigest()
+
+# 캐시에서 꺼낸 응답 또는 새로 받은 응답 (크롤러는 text/json()만 사용)
+class CachedResponse:
+    def __init__(self, content: bytes, encoding: str, body_hash: str, from_cache: bool):
+        self.content = content
+        self.encoding = encoding or "utf-8"
+        self.body_hash = body_hash
+        self.from_cache = from_cache
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self):
+        return json.loads(self.text)
+
+# 디스크 응답 캐시: 인덱스는 SQLite, 본문은 bodies/<해시> 파일
+# 크기가 max_bytes를 넘으면 오래 사용하지 않은 항목부터 90%까지 제거
+class ResponseCache:
+    def __init__(self, directory=MELON_CACHE_DIR, max_bytes=MELON_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "bodies"), exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                body_hash TEXT,
+                size INTEGER,
+                encoding TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL,
+                accessed_at REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS parsed (
+                body_hash TEXT,
+                parser TEXT,
+                args TEXT,
+                result TEXT,
+                PRIMARY KEY (body_hash, parser, args)
+            )
+        """)
+        self.conn.commit()
+        self.total_bytes = self._body_bytes()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.parse_skips = 0
+
+    def _body_bytes(self):
+        with self.lock:
+            row = self.conn.execute("SELECT SUM(size) FROM (SELECT DISTINCT body_hash, size FROM entries)").fetchone()
+        return row[0] or 0
+
+    def _body_path(self, body_hash):
+        return os.path.join(self.directory, "bodies", body_hash)
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body_hash, encoding, etag, last_modified, stored_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        body_hash, encoding, etag, last_modified, stored_at = row
+        return {"body_hash": body_hash, "encoding": encoding, "etag": etag,
+                "last_modified": last_modified, "stored_at": stored_at}
+
+    def read_body(self, body_hash):
+        try:
+            with open(self._body_path(body_hash), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    # 캐시 항목을 사용함 (revalidated=True면 304 응답으로 유지 시간도 갱신)
+    def touch(self, key, revalidated=False):
+        now = time.time()
+        with self.lock:
+            if revalidated:
+                self.conn.execute("UPDATE entries SET accessed_at = ?, stored_at = ? WHERE key = ?", (now, now, key))
+            else:
+                self.conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+
+    def store(self, key, url, content, encoding, etag, last_modified):
+        body_hash = hashlib.sha256(content).hexdigest()
+        path = self._body_path(body_hash)
+        now = time.time()
+        with self.lock:
+            if not os.path.exists(path):
+                with open(path + ".tmp", "wb") as f:
+                    f.write(content)
+                os.replace(path + ".tmp", path)
+            previous = self.conn.execute("SELECT body_hash FROM entries WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, url, body_hash, size, encoding, etag, last_modified, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, body_hash, len(content), encoding, etag, last_modified, now, now),
+            )
+            if previous and previous[0] != body_hash:
+                self._release_body(previous[0])
+            self.conn.commit()
+        self.total_bytes = self._body_bytes()
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+        return body_hash
+
+    # 더 이상 참조되지 않는 본문과 파싱 결과 삭제, 삭제되면 True (lock 안에서 호출)
+    def _release_body(self, body_hash):
+        in_use = self.conn.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone()
+        if in_use:
+            return False
+        self.conn.execute("DELETE FROM parsed WHERE body_hash = ?", (body_hash,))
+        try:
+            os.remove(self._body_path(body_hash))
+        except FileNotFoundError:
+            pass
+        return True
+
+    def evict(self):
+        target = self.max_bytes * 0.9
+        total = self.total_bytes
+        evicted = 0
+        with self.lock:
+            rows = self.conn.execute("SELECT key, body_hash, size FROM entries ORDER BY accessed_at").fetchall()
+            for key, body_hash, size in rows:
+                if total <= target:
+                    break
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                if self._release_body(body_hash):
+                    total -= size
+                evicted += 1
+            self.conn.commit()
+        self.total_bytes = self._body_bytes()
+        logger.info(f"Evicted {evicted} cached responses ({self.total_bytes} bytes left)")
+
+    def get_parsed(self, body_hash, parser, args):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT result FROM parsed WHERE body_hash = ? AND parser = ? AND args = ?", (body_hash, parser, args)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def store_parsed(self, body_hash, parser, args, result):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO parsed (body_hash, parser, args, result) VALUES (?, ?, ?, ?)",
+                (body_hash, parser, args, json.dumps(result)),
+            )
+            self.conn.commit()
+
+    def stats(self):
+        return {"bytes": self.total_bytes, "max_bytes": self.max_bytes, "hits": self.hits,
+                "revalidated": self.revalidated, "misses": self.misses, "parse_skips": self.parse_skips}
+
+_cache = None
+
+# 프로세스 전체에서 공유하는 캐시 (비활성화되어 있으면 None)
+def get_cache():
+    global _cache
+    if _cache is None and MELON_CACHE_ENABLED:
+        _cache = ResponseCache()
+    return _cache
+
+# 본문이 이전과 같으면 저장해 둔 파싱 결과를 사용하고, 바뀌었으면 파싱 후 저장
+# parse는 프로세스 풀에서 실행할 모듈 수준 함수, 인자와 결과는 JSON으로 저장 가능해야 함
+async def parse_cached(parse, response, *args):
+    cache = get_cache()
+    body_hash = getattr(response, "body_hash", None)
+    if cache is None or body_hash is None:
+        return await run_in_process(parse, response.text, *args)
+
+    parser = f"{parse.__module__}:{parse.__qualname__}"
+    key = json.dumps(args)
+    result = await asyncio.to_thread(cache.get_parsed, body_hash, parser, key)
+    if result is not None:
+        cache.parse_skips += 1
+        return result
+
+    result = await run_in_process(parse, response.text, *args)
+    await asyncio.to_thread(cache.store_parsed, body_hash, parser, key, result)
+    return result
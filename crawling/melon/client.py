@@ -0,0 +1,226 @@
+import httpx
+import asyncio
+import logging
+import os
+import time
+from crawling.melon.cache import CachedResponse, cache_key, cache_ttl, get_cache
+from crawling.melon.rate_limit import get_limiter
+from crawling.melon.replay import record_response, recording_enabled
+from crawling.melon.retry import RETRY_MAX_ATTEMPTS, CrawlerError, RetryBudgetExceeded, backoff_delay, get_breaker, hedged, is_retryable, take_retry
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 크롤러 공용 HTTP 클라이언트 설정
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1"
+
+# 값이 있으면 멜론 요청을 이 주소(replay 서버 등)로 보냄
+MELON_BASE_URL = os.getenv("MELON_BASE_URL", "")
+
+_client = None
+
+# HTTP/2는 h2 패키지가 설치된 경우에만 사용
+def http2_available() -> bool:
+    try:
+        import h2
+        return True
+    except ImportError:
+        return False
+
+def create_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=HTTP2_ENABLED and http2_available(),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT),
+        follow_redirects=True,
+    )
+
+# 모든 크롤러가 공유하는 keep-alive 클라이언트 (처음 사용할 때 생성)
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_client()
+    return _client
+
+# https://www.melon.com/artist/... -> {MELON_BASE_URL}/www.melon.com/artist/...
+def melon_url(url: str) -> str:
+    if not MELON_BASE_URL:
+        return url
+    parsed = httpx.URL(url)
+    return str(httpx.URL(f"{MELON_BASE_URL.rstrip('/')}/{parsed.host}{parsed.path}", query=parsed.query))
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+# 호스트별 속도 제한을 거쳐 GET 요청 (모든 크롤러 요청은 이 함수를 사용)
+# acquire()는 기다리다 취소되면 스스로 자리를 돌려주므로, 자리를 얻은 뒤부터만 release
+# admitted(asyncio.Event)가 있으면 속도 제한을 통과한 시점에 set
+async def request(url: str, params=None, headers=None, client: httpx.AsyncClient = None,
+                  admitted: asyncio.Event = None, **kwargs) -> httpx.Response:
+    limiter = get_limiter(httpx.URL(url).host)
+    await limiter.acquire()
+    if admitted is not None:
+        admitted.set()
+    started = time.monotonic()
+    status_code = None
+    try:
+        response = await (client or get_client()).get(melon_url(url), params=params, headers=headers, **kwargs)
+        status_code = response.status_code
+        if recording_enabled():
+            await asyncio.to_thread(record_response, response)
+        return response
+    finally:
+        await limiter.release(status_code, time.monotonic() - started)
+
+# 서킷 브레이커와 재시도 정책을 적용한 GET 요청 (2xx가 아니면 CrawlerError)
+# hedge=True는 card.json처럼 느린 멱등 요청에 두 번째 요청을 보내 지연을 줄임
+# 헤징 대기 시간은 첫 요청이 속도 제한을 통과한 뒤부터 세고, 제한기에 여유가 없으면 두 번째 요청을 보내지 않음
+async def fetch(url: str, params=None, headers=None, client: httpx.AsyncClient = None,
+                attempts: int = RETRY_MAX_ATTEMPTS, hedge: bool = False, **kwargs) -> httpx.Response:
+    host = httpx.URL(url).host
+    breaker = get_breaker(host)
+    limiter = get_limiter(host)
+
+    async def attempt_once(admitted=None):
+        breaker.before_request()
+        try:
+            response = await request(url, params=params, headers=headers, client=client, admitted=admitted, **kwargs)
+        except httpx.TransportError:
+            breaker.record_failure()
+            raise
+        except asyncio.CancelledError:
+            breaker.cancel_probe()
+            raise
+        if is_retryable(response.status_code):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    for attempt in range(attempts):
+        error = None
+        try:
+            response = await (hedged(attempt_once, should_hedge=limiter.has_capacity) if hedge else attempt_once())
+            # 304는 캐시 재검증(조건부 요청)에 대한 응답
+            if response.is_success or response.status_code == 304:
+                return response
+            if not is_retryable(response.status_code):
+                raise CrawlerError(f"HTTP {response.status_code} from {url}")
+            error = f"HTTP {response.status_code}"
+        except httpx.TransportError as e:
+            error = f"{type(e).__name__}: {e}"
+
+        if attempt + 1 >= attempts:
+            raise CrawlerError(f"Failed to fetch {url} after {attempts} attempts ({error})")
+        if not take_retry():
+            raise RetryBudgetExceeded(f"Retry budget exhausted while fetching {url} ({error})")
+        delay = backoff_delay(attempt)
+        logger.warning(f"Retrying {url} in {delay:.2f}s ({attempt + 1}/{attempts}): {error}")
+        await asyncio.sleep(delay)
+
+# 캐시 대상 엔드포인트(cache.CACHE_TTLS)는 디스크 캐시를 거쳐 요청
+# 유지 시간 안이면 요청하지 않고, 지났으면 ETag/Last-Modified 조건부 요청으로 재검증
+async def fetch_cached(url: str, params=None, headers=None, client: httpx.AsyncClient = None, **kwargs) -> CachedResponse:
+    cache = get_cache()
+    ttl = cache_ttl(url)
+    if cache is None or ttl is None:
+        response = await fetch(url, params=params, headers=headers, client=client, **kwargs)
+        return CachedResponse(response.content, response.encoding, None, False)
+
+    key = cache_key(url, params)
+    entry = await asyncio.to_thread(cache.get, key)
+    content = None
+    if entry is not None:
+        content = await asyncio.to_thread(cache.read_body, entry["body_hash"])
+    if content is not None:
+        if time.time() - entry["stored_at"] < ttl:
+            cache.hits += 1
+            await asyncio.to_thread(cache.touch, key)
+            return CachedResponse(content, entry["encoding"], entry["body_hash"], True)
+
+        headers = dict(headers or {})
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = await fetch(url, params=params, headers=headers, client=client, **kwargs)
+    if response.status_code == 304 and content is not None:
+        cache.revalidated += 1
+        await asyncio.to_thread(cache.touch, key, True)
+        return CachedResponse(content, entry["encoding"], entry["body_hash"], True)
+
+    cache.misses += 1
+    body_hash = await asyncio.to_thread(
+        cache.store, key, str(response.url), response.content, response.encoding,
+        response.headers.get("ETag"), response.headers.get("Last-Modified"),
+    )
+    return CachedResponse(response.content, response.encoding, body_hash, False)
+
+# 로컬 스텁 서버로 요청마다 새 클라이언트를 만드는 경우와 공용 클라이언트를 비교 (python -m crawling.melon.client)
+def start_stub_server():
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        connections = 0
+
+        def setup(self):
+            super().setup()
+            StubHandler.connections += 1
+
+        def do_GET(self):
+            body = b'{"contsLike": []}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, StubHandler
+
+async def benchmark(request_count=1000, concurrency=20):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    server, handler = start_stub_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}/commonlike/getSongLike.json"
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fresh_client_request():
+        async with semaphore:
+            async with httpx.AsyncClient() as client:
+                (await client.get(url)).raise_for_status()
+
+    async def shared_client_request():
+        async with semaphore:
+            (await get_client().get(url)).raise_for_status()
+
+    for name, request in (("new client per request", fresh_client_request), ("shared client", shared_client_request)):
+        handler.connections = 0
+        started = time.monotonic()
+        await asyncio.gather(*(request() for _ in range(request_count)))
+        elapsed = time.monotonic() - started
+        print(f"{name}: {request_count} requests in {elapsed:.2f}s ({request_count / elapsed:.0f} req/s), {handler.connections} connections opened")
+
+    await close_client()
+    server.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(benchmark())
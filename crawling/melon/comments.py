@@ -1,15 +1,23 @@
-import httpx
 import logging
 import asyncio
+import math
+import os
+from task_context import report_progress
+from crawling.melon.client import fetch, get_client
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-SEMAPHORE_LIMIT = 20  # 동시에 허용할 최대 요청 수
+# 댓글 API가 허용하는 최대 페이지 크기와 전체 앨범이 공유하는 동시 페이지 요청 수
+COMMENT_PAGE_SIZE = int(os.getenv("MELON_COMMENT_PAGE_SIZE", "50"))
+COMMENT_CONCURRENCY = int(os.getenv("MELON_COMMENT_CONCURRENCY", "8"))
 
-async def fetch_page(session, artist_id, album_id, page_no, chnl_seq='102', page_size=10):
+_page_semaphore = asyncio.Semaphore(COMMENT_CONCURRENCY)
+
+# 페이지 하나 조회, (댓글 목록, 전체 댓글 수) 반환
+# 실패하면 CrawlerError를 그대로 전달 (빈 페이지로 처리하면 빠진 댓글을 알 수 없음)
+async def fetch_page(session, artist_id, album_id, page_no, chnl_seq='102', page_size=COMMENT_PAGE_SIZE):
     base_url = "https://cmt.melon.com/cmt/api/api_listCmt.json"
-    semaphore = asyncio.Semaphore(SEMAPHORE_LIMIT)
     
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/71.0.3578.98 Safari/537.36',
@@ -35,65 +43,134 @@ async def fetch_page(session, artist_id, album_id, page_no, chnl_seq='102', page
         'srchWord': ''
     }
 
+    async with _page_semaphore:
+        response = await fetch(base_url, headers=headers, params=params, timeout=10, client=session)
+
+    json_data = response.json()
+    result = json_data.get('result', {})
+    comments = result.get('cmtList', [])
+    paging_info = result.get('pagingInfo', {})
+    total_count = paging_info.get('totalCnt', paging_info.get('validCnt'))
+
+    page_comments = []
+
+    for comment in comments:
+        cmt_info = comment.get('cmtInfo', {})
+        member_info = comment.get('memberInfo', {})
+
+        comment_data = {
+            'id': cmt_info.get('cmtSeq'),
+            'artist_id': artist_id,
+            'album_id': album_id,
+            'user_id': member_info.get('memberKey'),
+            'username': member_info.get('memberNickname'),
+            'content': cmt_info.get('cmtCont'),
+            'display_date': cmt_info.get('dsplyDate'),
+            'display_time': cmt_info.get('dsplyTime'),
+            'recommendations': cmt_info.get('recmCnt'),
+            'non_recommendations': cmt_info.get('nonRecmCnt'),
+        }
+        page_comments.append(comment_data)
+
+    return page_comments, total_count
+
+# 첫 페이지의 전체 댓글 수로 페이지 수를 계산하고 나머지 페이지를 동시에 조회해 받는 대로 내보냄
+# 앨범당 COMMENT_CONCURRENCY개 워커가 다음 페이지 번호를 차례로 가져가므로 한 번에 만드는 요청 수가 제한됨
+async def iter_all_comments(artist_id, album_id, chnl_seq='102', page_size=COMMENT_PAGE_SIZE):
+    session = get_client()
+    first_page_comments, total_count = await fetch_page(session, artist_id, album_id, page_no=1, chnl_seq=chnl_seq, page_size=page_size)
+
+    if not first_page_comments:
+        return
+
+    # 수집 중 새 댓글이 달리면 페이지 경계가 밀려 같은 댓글이 두 번 나올 수 있음
+    seen = set()
+    for comment in first_page_comments:
+        seen.add(comment['id'])
+        yield comment
+
+    # 전체 댓글 수를 모르면 페이지 수를 계산할 수 없으므로 빈 페이지가 나올 때까지 차례로 조회
+    if total_count is None:
+        logger.warning(f"Total comment count missing for album {album_id}, fetching pages until an empty page")
+        async for comment in iter_new_comments(artist_id, album_id, None, chnl_seq, page_size, start_page=2):
+            if comment['id'] not in seen:
+                seen.add(comment['id'])
+                yield comment
+        return
+    max_pages = max(1, math.ceil(int(total_count) / page_size))
+
+    fetched_pages = 1
+    next_page = 2
+    report_progress("comment_pages", fetched_pages, max_pages, album_id=album_id)
+
+    # 소비하는 쪽(저장)이 느리면 워커도 기다리도록 페이지 대기열 크기를 제한
+    pages = asyncio.Queue(maxsize=COMMENT_CONCURRENCY)
+
+    async def page_worker():
+        nonlocal next_page
+        while next_page <= max_pages:
+            page_no = next_page
+            next_page += 1
+            page_comments, _ = await fetch_page(session, artist_id, album_id, page_no, chnl_seq, page_size)
+            await pages.put(page_comments)
+
+    # 한 페이지라도 실패하면 나머지 워커를 멈추고, 받은 댓글을 다 내보낸 뒤 오류를 전달 (짧은 목록을 성공으로 보지 않도록)
+    # 취소된 경우에는 받는 쪽이 없으므로 None을 보내지 않음 (대기열이 차 있으면 영원히 기다리게 됨)
+    async def run_workers():
+        workers = [asyncio.create_task(page_worker()) for _ in range(min(COMMENT_CONCURRENCY, max_pages - 1))]
+        try:
+            await asyncio.gather(*workers)
+        except Exception:
+            for worker in workers:
+                worker.cancel()
+            await pages.put(None)
+            raise
+        await pages.put(None)
+
+    runner = asyncio.create_task(run_workers())
     try:
-        async with semaphore:
-            response = await session.get(base_url, headers=headers, params=params, timeout=10)
-            # await asyncio.sleep(0.001)
-            response.raise_for_status()
-
-            json_data = response.json()
-            comments = json_data.get('result', {}).get('cmtList', [])
-
-            page_comments = []
-
-            for comment in comments:
-                cmt_info = comment.get('cmtInfo', {})
-                member_info = comment.get('memberInfo', {})
-
-                comment_data = {
-                    'id': cmt_info.get('cmtSeq'),
-                    'artist_id': artist_id,
-                    'album_id': album_id,
-                    'user_id': member_info.get('memberKey'),
-                    'username': member_info.get('memberNickname'),
-                    'content': cmt_info.get('cmtCont'),
-                    'display_date': cmt_info.get('dsplyDate'),
-                    'display_time': cmt_info.get('dsplyTime'),
-                    'recommendations': cmt_info.get('recmCnt'),
-                    'non_recommendations': cmt_info.get('nonRecmCnt'),
-                }
-                page_comments.append(comment_data)
-
-            return page_comments
-
-    except httpx.RequestError as e:
-        logger.warning(f"Request failed on page {page_no} for album {album_id}: {e}")
-        return []
-
-async def retrieve_comments(artist_id, album_id, chnl_seq='102', page_size=10, max_pages=10):
-    async with httpx.AsyncClient() as session:
-        all_comments = []
-        first_page_comments = await fetch_page(session, artist_id, album_id, page_no=1, chnl_seq=chnl_seq, page_size=page_size)
-
-        if not first_page_comments:
-            return []
-        
-        all_comments.extend(first_page_comments)
-        total_comments = len(first_page_comments) * page_size
-        max_pages = total_comments // page_size + (total_comments % page_size > 0)
-
-        tasks = [
-            fetch_page(session, artist_id, album_id, page_no, chnl_seq, page_size)
-            for page_no in range(2, max_pages + 1)
-        ]
-
-        for responses in await asyncio.gather(*tasks):
-            if responses:
-                all_comments.extend(responses)
-
-    return all_comments
-
-async def get_comments(artist_id, album_id):
-    comments = await retrieve_comments(artist_id, album_id)
+        while (page_comments := await pages.get()) is not None:
+            fetched_pages += 1
+            report_progress("comment_pages", fetched_pages, max_pages, album_id=album_id)
+            for comment in page_comments:
+                if comment['id'] not in seen:
+                    seen.add(comment['id'])
+                    yield comment
+        await runner
+    finally:
+        runner.cancel()
+
+# since_seq(이미 저장된 가장 최신 cmtSeq)보다 새 댓글만 조회 (None이면 모든 댓글)
+# 목록은 최신순(sortType=0)이므로 since_seq 이하 댓글이 나오는 페이지에서 멈춤
+# 그 밖에는 전체 댓글 수로 계산한 마지막 페이지에서 멈추고, 전체 댓글 수를 모르면 빈 페이지가 나올 때까지 조회
+# 중간 페이지 조회가 실패하면 CrawlerError (새 댓글이 끝난 것으로 보지 않음)
+async def iter_new_comments(artist_id, album_id, since_seq, chnl_seq='102', page_size=COMMENT_PAGE_SIZE, start_page=1):
+    session = get_client()
+    page_no = start_page
+
+    while True:
+        page_comments, total_count = await fetch_page(session, artist_id, album_id, page_no, chnl_seq, page_size)
+        for comment in page_comments:
+            if since_seq is not None and int(comment['id']) <= since_seq:
+                return
+            yield comment
+
+        if not page_comments:
+            return
+        if total_count:
+            max_pages = math.ceil(int(total_count) / page_size)
+            report_progress("comment_pages", page_no, max_pages, album_id=album_id)
+            if page_no >= max_pages:
+                return
+        page_no += 1
+
+# 앨범 댓글을 받는 대로 하나씩 내보냄 (since_seq가 있으면 그 이후 댓글만)
+def iter_comments(artist_id, album_id, since_seq=None):
+    if since_seq is not None:
+        return iter_new_comments(artist_id, album_id, int(since_seq))
+    return iter_all_comments(artist_id, album_id)
+
+async def get_comments(artist_id, album_id, since_seq=None):
+    comments = [comment async for comment in iter_comments(artist_id, album_id, since_seq)]
     logger.info(f"Processed {len(comments)} comments for album {album_id}")
-    return comments
\ No newline at end of file
+    return comments
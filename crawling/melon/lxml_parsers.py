@@ -0,0 +1,165 @@
+import logging
+from datetime import datetime
+import lxml.html
+from lxml.etree import XPath
+
+# parsers.py의 목록 파싱 함수를 lxml로 직접 구현 (BeautifulSoup 트리를 만들지 않음)
+# 결과는 parsers.py의 html.parser 구현과 같아야 함 (python -m crawling.melon.parsers로 확인)
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("crawling.melon.parsers")
+
+# class 속성에 name이 포함된 요소 (BeautifulSoup의 class_=name과 같은 조건)
+def _cls(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+ALBUM_ROWS = XPath(f"//li[{_cls('album11_li')}]")
+SONG_ROWS = XPath(f"//div[{_cls('tb_list')}]//table//tbody//tr")
+VIDEO_ROWS = XPath(f"//li[{_cls('vdo_li04')}]")
+PHOTO_ROWS = XPath(f"//li[{_cls('photo02_li')}]")
+
+THUMB_LINK = XPath(f".//a[{_cls('thumb')}]")
+ELLIPSIS_LINK = XPath(f".//a[{_cls('ellipsis')}]")
+ARTIST_LINK = XPath(f".//a[{_cls('play_artist')}]")
+VIEW_COUNT = XPath(f".//span[{_cls('cnt_view')}]")
+IMAGE = XPath(".//img")
+LIKE_LABEL = XPath(f".//strong[{_cls('none')}]")
+TOTAL_SONGS = XPath(f".//span[{_cls('tot_song')}]")
+SONG_ARTIST = XPath(f".//td[{_cls('t_left')}]//div[{_cls('wrap')} and {_cls('wrapArtistName')}]//*[@id='artistName']//a")
+LIKE_BUTTON = XPath(f".//button[{_cls('btn_icon')} and {_cls('like')}]")
+TITLED_LINK = XPath(".//a[@title]")
+PLAY_TIME = XPath(f".//span[{_cls('time')}]")
+ARTIST_NAME_DD = XPath(f".//dd[{_cls('atistname')}]")
+
+def _first(element, xpath):
+    found = xpath(element)
+    return found[0] if found else None
+
+def _document(html: str):
+    if not html or not html.strip():
+        return None
+    return lxml.html.fromstring(html)
+
+def parse_album_list(paging_songs: str, artist_id: str):
+    document = _document(paging_songs)
+    albums = []
+    album_ids = []
+    if document is None:
+        return albums, album_ids
+
+    for album_li in ALBUM_ROWS(document):
+        album = {}
+
+        album_link = _first(album_li, THUMB_LINK)
+        if album_link is not None:
+            album_id = album_link.attrib['href'].split("'")[1]
+            album['id'] = album_id
+            album_ids.append(album_id)
+
+        album_name_tag = _first(album_li, ELLIPSIS_LINK)
+        album['album_name'] = album_name_tag.text_content() if album_name_tag is not None else 'N/A'
+
+        artist_name_tag = _first(album_li, ARTIST_LINK)
+        album['artist_name'] = artist_name_tag.text_content() if artist_name_tag is not None else 'Various Artists'
+
+        release_date_tag = _first(album_li, VIEW_COUNT)
+        release_date = release_date_tag.text_content() if release_date_tag is not None else ''
+        if release_date:
+            try:
+                datetime.strptime(release_date, "%Y.%m.%d")
+                album['release_date'] = release_date
+            except ValueError:
+                logger.warning(f"Invalid date format for album {album.get('id')}: {release_date}")
+                album['release_date'] = 'N/A'
+        else:
+            album['release_date'] = 'N/A'
+
+        album_image_tag = _first(album_li, IMAGE)
+        album['album_image_url'] = album_image_tag.attrib['src'] if album_image_tag is not None else 'N/A'
+
+        like_count_tag = _first(album_li, LIKE_LABEL)
+        album['like_count'] = like_count_tag.tail.strip() if like_count_tag is not None else '0'
+
+        total_songs_tag = _first(album_li, TOTAL_SONGS)
+        album['total_songs'] = int(total_songs_tag.text_content().replace('곡', '')) if total_songs_tag is not None else 0
+
+        album['artist_id'] = artist_id
+
+        albums.append(album)
+
+    return albums, album_ids
+
+def parse_song_list(paging_songs: str):
+    document = _document(paging_songs)
+    artist_list, song_list, song_titles = [], [], []
+    if document is None:
+        return artist_list, song_list, song_titles
+
+    for tr in SONG_ROWS(document):
+        artist_name_elem = _first(tr, SONG_ARTIST)
+        if artist_name_elem is not None:
+            artist_list.append(artist_name_elem.text_content())
+        else:
+            logger.warning(f"Artist name not found in tr: {lxml.html.tostring(tr, encoding='unicode')}")
+
+        song_button_elem = _first(tr, LIKE_BUTTON)
+        if song_button_elem is not None:
+            song_list.append(song_button_elem.attrib['data-song-no'])
+            song_titles.append(song_button_elem.attrib['title'])
+        else:
+            logger.warning(f"Song button not found in tr: {lxml.html.tostring(tr, encoding='unicode')}")
+
+    return artist_list, song_list, song_titles
+
+def parse_video_list(video_data: str, artist_id: str) -> list:
+    document = _document(video_data)
+    videos = []
+    if document is None:
+        return videos
+
+    for video_item in VIDEO_ROWS(document):
+        video = {}
+        video['artist_id'] = artist_id
+
+        video_link = _first(video_item, THUMB_LINK)
+        if video_link is not None:
+            video['id'] = video_link.attrib['href'].split(",")[1].replace("'", '')
+
+        video_title_tag = _first(video_item, TITLED_LINK)
+        video['title'] = video_title_tag.get('title', 'N/A').replace(' - 페이지 이동', '')
+
+        playtime_tag = _first(video_item, PLAY_TIME)
+        video['playtime'] = playtime_tag.text_content() if playtime_tag is not None else 'N/A'
+
+        video_image_tag = _first(video_item, IMAGE)
+        video['thumbnail_url'] = video_image_tag.attrib['src'] if video_image_tag is not None else 'N/A'
+
+        artist_name_tag = _first(_first(video_item, ARTIST_NAME_DD), ARTIST_LINK)
+        video['artist_name'] = artist_name_tag.text_content() if artist_name_tag is not None else 'N/A'
+
+        view_count_tag = _first(video_item, VIEW_COUNT)
+        video['view_count'] = int(view_count_tag.text_content().split()[-1].replace(',', '')) if view_count_tag is not None else 0
+
+        videos.append(video)
+
+    return videos
+
+def parse_photo_list(photo_data: str, artist_id: str) -> list:
+    document = _document(photo_data)
+    photos = []
+    if document is None:
+        return photos
+
+    for photo_item in PHOTO_ROWS(document):
+        photo = {}
+        photo['artist_id'] = artist_id
+
+        title_tag = _first(photo_item, THUMB_LINK)
+        photo['id'] = title_tag.get('href').split(",")[1].replace("'", '')
+        photo['title'] = title_tag.get('title', 'N/A')
+
+        img_tag = _first(photo_item, IMAGE)
+        photo['image_url'] = img_tag.attrib['src'] if img_tag is not None else 'N/A'
+
+        photos.append(photo)
+
+    return photos
@@ -0,0 +1,289 @@
+from bs4 import BeautifulSoup, SoupStrainer
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+try:
+    from crawling.melon import lxml_parsers
+except ImportError:
+    lxml_parsers = None
+
+# 목록 페이지 HTML 파싱 함수들 (CPU 사용량이 커서 프로세스 풀에서 실행됨)
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 파서 백엔드: html.parser(BeautifulSoup, 기존 방식) 또는 lxml(lxml_parsers.py, XPath로 직접 추출)
+# auto면 lxml이 설치되어 있을 때 lxml 사용
+# lxml/auto는 녹화한 실제 페이지로 python -m crawling.melon.parsers [녹화 디렉터리]가 identical을 출력한 뒤에만 사용
+HTML_PARSER = os.getenv("MELON_HTML_PARSER", "html.parser")
+
+# html.parser 사용 시 1이면 목록 행만 트리로 만들고 나머지 페이지는 건너뜀
+# SoupStrainer는 트리를 만드는 방식이 달라지므로 lxml과 같이 녹화한 실제 페이지에서 identical을 확인한 뒤에만 사용
+HTML_PARSE_SCOPED = os.getenv("MELON_HTML_PARSE_SCOPED", "0") == "1"
+
+# 페이지별로 파싱할 범위
+ALBUM_ROWS = SoupStrainer('li', class_='album11_li')
+SONG_TABLE = SoupStrainer('div', class_='tb_list')
+VIDEO_ROWS = SoupStrainer('li', class_='vdo_li04')
+PHOTO_ROWS = SoupStrainer('li', class_='photo02_li')
+
+def lxml_available() -> bool:
+    return lxml_parsers is not None
+
+def get_parser_backend() -> str:
+    if HTML_PARSER != "auto":
+        return HTML_PARSER
+    return "lxml" if lxml_available() else "html.parser"
+
+def make_soup(html: str, parse_only: SoupStrainer) -> BeautifulSoup:
+    return BeautifulSoup(html, 'html.parser', parse_only=parse_only if HTML_PARSE_SCOPED else None)
+
+# 프로세스 풀 워커 시작 시 호출
+def warm_up():
+    parse_album_list("<li class='album11_li'></li>", "")
+
+# 앨범 목록 파싱
+def parse_album_list(paging_songs: str, artist_id: str):
+    if get_parser_backend() == "lxml":
+        return lxml_parsers.parse_album_list(paging_songs, artist_id)
+
+    paging_response = make_soup(paging_songs, ALBUM_ROWS)
+    albums = []
+    album_ids = []
+    release_dates = []
+
+    for album_li in paging_response.select('li.album11_li'):
+        album = {}
+        
+        # 앨범 ID 추출
+        album_link = album_li.find('a', class_='thumb')
+        if album_link:
+            album_id = album_link['href'].split("'")[1]
+            album['id'] = album_id
+            album_ids.append(album_id)
+            
+        # 앨범명 추출
+        album_name_tag = album_li.find('a', class_='ellipsis')
+        album['album_name'] = album_name_tag.text if album_name_tag else 'N/A'
+        
+        # 아티스트명 추출
+        artist_name_tag = album_li.find('a', class_='play_artist')
+        album['artist_name'] = artist_name_tag.text if artist_name_tag else 'Various Artists'
+        
+        # 앨범 발매일 추출
+        release_date_tag = album_li.find('span', class_='cnt_view')
+        if release_date_tag and release_date_tag.text:
+            try:
+                release_date = release_date_tag.text
+                release_dates.append(datetime.strptime(release_date, "%Y.%m.%d"))
+                album['release_date'] = release_date
+            except ValueError:
+                logger.warning(f"Invalid date format for album {album.get('id')}: {release_date}")
+                album['release_date'] = 'N/A'
+        else:
+            album['release_date'] = 'N/A'
+        
+        # 앨범 이미지 URL 추출
+        album_image_tag = album_li.find('img')
+        album['album_image_url'] = album_image_tag['src'] if album_image_tag else 'N/A'
+        
+        # 좋아요 수 추출
+        like_count_tag = album_li.find('strong', class_='none')
+        album['like_count'] = like_count_tag.next_sibling.strip() if like_count_tag else '0'
+        
+        # 곡 수 추출
+        total_songs_tag = album_li.find('span', class_='tot_song')
+        album['total_songs'] = int(total_songs_tag.text.replace('곡','')) if total_songs_tag else 0
+
+        album['artist_id'] = artist_id
+        
+        albums.append(album)
+
+    return albums, album_ids
+
+# 노래 목록 파싱
+def parse_song_list(paging_songs: str):
+    if get_parser_backend() == "lxml":
+        return lxml_parsers.parse_song_list(paging_songs)
+
+    paging_response = make_soup(paging_songs, SONG_TABLE)
+
+    artist_list, song_list, song_titles = [], [], []
+    for tr in paging_response.select('div.tb_list table tbody tr'):
+        # 아티스트 이름 추출
+        artist_name_elem = tr.select('td.t_left div.wrap.wrapArtistName #artistName a')
+        if artist_name_elem:
+            artist_feat = artist_name_elem[0].text
+            artist_list.append(artist_feat)
+        else:
+            logger.warning(f"Artist name not found in tr: {tr}")
+
+        # 곡 ID 및 제목 추출
+        song_button_elem = tr.select('button.btn_icon.like')
+        if song_button_elem:
+            song_id = song_button_elem[0].attrs['data-song-no']
+            song_title = song_button_elem[0].attrs['title']
+            song_list.append(song_id)
+            song_titles.append(song_title)
+        else:
+            logger.warning(f"Song button not found in tr: {tr}")
+            continue  # song_button_elem이 없으면 다음 tr로 넘어감
+
+    return artist_list, song_list, song_titles
+
+# 비디오 목록 파싱
+def parse_video_list(video_data: str, artist_id: str) -> list:
+    if get_parser_backend() == "lxml":
+        return lxml_parsers.parse_video_list(video_data, artist_id)
+
+    soup = make_soup(video_data, VIDEO_ROWS)
+    videos = []
+
+    for video_item in soup.select('li.vdo_li04'):
+        video = {}
+        video['artist_id'] = artist_id
+
+        # 비디오 ID 추출
+        video_link = video_item.find('a', class_='thumb')
+        if video_link:
+            video['id'] = video_link['href'].split(",")[1].replace("'", '')
+
+        # 비디오 제목 추출
+        video_title_tag = video_item.find('a', title=True)
+        video['title'] = video_title_tag.get('title', 'N/A').replace(' - 페이지 이동', '')
+
+        # 비디오 재생시간 추출
+        playtime_tag = video_item.find('span', class_='time')
+        video['playtime'] = playtime_tag.text if playtime_tag else 'N/A'
+
+        # 비디오 썸네일 URL 추출
+        video_image_tag = video_item.find('img')
+        video['thumbnail_url'] = video_image_tag['src'] if video_image_tag else 'N/A'
+
+        # 아티스트 이름 추출
+        artist_name_tag = video_item.find('dd', class_='atistname').find('a', class_='play_artist')
+        video['artist_name'] = artist_name_tag.text if artist_name_tag else 'N/A'
+
+        # 조회수 추출
+        view_count_tag = video_item.find('span', class_='cnt_view')
+        video['view_count'] = int(view_count_tag.text.split()[-1].replace(',', '')) if view_count_tag else 0
+
+        videos.append(video)
+
+    return videos
+
+# 포토 목록 파싱
+def parse_photo_list(photo_data: str, artist_id: str) -> list:
+    if get_parser_backend() == "lxml":
+        return lxml_parsers.parse_photo_list(photo_data, artist_id)
+
+    soup = make_soup(photo_data, PHOTO_ROWS)
+    photos = []
+
+    for photo_item in soup.select('li.photo02_li'):
+        photo = {}
+        photo['artist_id'] = artist_id
+
+        # 포토 ID 추출
+        photo_id = photo_item.find('a', class_='thumb').get('href').split(",")[1].replace("'",'')
+        photo['id'] = photo_id
+
+        # 포토 제목 추출
+        title_tag = photo_item.find('a', class_='thumb')
+        photo['title'] = title_tag.get('title', 'N/A')
+
+        # 포토 이미지 URL 추출
+        img_tag = photo_item.find('img')
+        photo['image_url'] = img_tag['src'] if img_tag else 'N/A'
+
+        photos.append(photo)
+
+    return photos
+
+LIST_PARSERS = {
+    "/artist/albumPaging.htm": lambda html: parse_album_list(html, "0"),
+    "/artist/songPaging.htm": lambda html: parse_song_list(html),
+    "/artist/videoPaging.htm": lambda html: parse_video_list(html, "0"),
+    "/artist/photoPaging.htm": lambda html: parse_photo_list(html, "0"),
+}
+
+# 녹화본이 없을 때 사용할 rows행짜리 목록 페이지
+def sample_pages(rows=2000):
+    header = "<html><head><title>melon</title></head><body><div id='gnb'>" + "<a href='#'>menu</a>" * 200 + "</div>"
+    albums = "".join(
+        f"<li class='album11_li'><a class='thumb' href=\"javascript:melon.link.goAlbumDetail('{i}');\"><img src='https://cdnimg.melon.co.kr/{i}.jpg'/></a>"
+        f"<a class='ellipsis' href='#'>Album {i}</a><a class='play_artist' href='#'>Artist</a>"
+        f"<span class='cnt_view'>2020.01.{i % 28 + 1:02d}</span><strong class='none'>좋아요</strong> {i}<span class='tot_song'>{i % 12 + 1}곡</span></li>"
+        for i in range(rows)
+    )
+    songs = "".join(
+        f"<tr><td class='t_left'><div class='wrap wrapArtistName'><div id='artistName'><a href='#'>Artist {i % 3}</a></div></div></td>"
+        f"<td><button class='btn_icon like' data-song-no='{i}' title='Song {i}'>like</button></td></tr>"
+        for i in range(rows)
+    )
+    videos = "".join(
+        f"<li class='vdo_li04'><a class='thumb' href=\"javascript:melon.link.goMvDetail('1','{i}');\"><img src='https://cdnimg.melon.co.kr/v{i}.jpg'/>"
+        f"<span class='time'>03:{i % 60:02d}</span></a><a href='#' title='Video {i} - 페이지 이동'>Video {i}</a>"
+        f"<dl><dd class='atistname'><a class='play_artist' href='#'>Artist</a></dd></dl><span class='cnt_view'>재생수 {i},000</span></li>"
+        for i in range(rows)
+    )
+    photos = "".join(
+        f"<li class='photo02_li'><a class='thumb' href=\"javascript:melon.link.goPhotoDetail('1','{i}');\" title='Photo {i}'>"
+        f"<img src='https://cdnimg.melon.co.kr/p{i}.jpg'/></a></li>"
+        for i in range(rows)
+    )
+    footer = "<div id='footer'>" + "<p>footer</p>" * 200 + "</div></body></html>"
+    return {
+        "/artist/albumPaging.htm": [f"{header}<ul>{albums}</ul>{footer}"],
+        "/artist/songPaging.htm": [f"{header}<div class='tb_list'><table><tbody>{songs}</tbody></table></div>{footer}"],
+        "/artist/videoPaging.htm": [f"{header}<ul>{videos}</ul>{footer}"],
+        "/artist/photoPaging.htm": [f"{header}<ul>{photos}</ul>{footer}"],
+    }
+
+def load_fixture_pages(directory):
+    from crawling.melon.replay import load_recordings
+
+    recordings, _ = load_recordings(directory)
+    pages = {path: [] for path in LIST_PARSERS}
+    for recording in recordings.values():
+        path = recording["url"].split("?")[0].split("melon.com", 1)[-1]
+        if path in pages and recording["status"] == 200:
+            pages[path].append(recording["body"])
+    return pages
+
+# 기존 방식(html.parser, 전체 트리)과 결과가 같은지 확인하고 백엔드별 초당 처리 행 수 출력
+# python -m crawling.melon.parsers [녹화 디렉터리]
+def compare_backends(pages, repeat=3):
+    global HTML_PARSER, HTML_PARSE_SCOPED
+
+    backends = [("html.parser", False), ("html.parser", True)]
+    if lxml_available():
+        backends.append(("lxml", False))
+
+    mismatches = 0
+    for path, bodies in pages.items():
+        if not bodies:
+            continue
+        parse = LIST_PARSERS[path]
+        HTML_PARSER, HTML_PARSE_SCOPED = "html.parser", False
+        expected = [parse(body) for body in bodies]
+        rows = sum(len(result[-1] if isinstance(result, tuple) else result) for result in expected)
+
+        for backend, scoped in backends:
+            HTML_PARSER, HTML_PARSE_SCOPED = backend, scoped
+            started = time.perf_counter()
+            for _ in range(repeat):
+                results = [parse(body) for body in bodies]
+            elapsed = (time.perf_counter() - started) / repeat
+            same = results == expected
+            mismatches += not same
+            name = f"{backend}{' (scoped)' if scoped and backend != 'lxml' else ''}"
+            print(f"{path} {name:<22} {rows} rows in {elapsed:.3f}s ({rows / elapsed:,.0f} rows/s) {'identical' if same else 'MISMATCH'}")
+    return mismatches
+
+if __name__ == "__main__":
+    logging.getLogger(__name__).setLevel(logging.ERROR)
+    pages = load_fixture_pages(sys.argv[1]) if len(sys.argv) > 1 else sample_pages()
+    sys.exit(1 if compare_backends(pages) else 0)
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+import time
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 호스트별 초당 요청 수와 순간 허용량 (토큰 버킷)
+RATE_LIMIT_RPS = float(os.getenv("MELON_RATE_LIMIT_RPS", "20"))
+RATE_LIMIT_BURST = float(os.getenv("MELON_RATE_LIMIT_BURST", "40"))
+
+# 호스트별로 따로 정한 초당 요청 수와 순간 허용량, "호스트=rps[:burst]"를 쉼표로 구분
+# 예: MELON_HOST_RATE_LIMITS="m2.melon.com=50:100" (card.json 등 곡 통계 조회 예산을 따로 설정)
+def parse_host_rate_limits(value: str) -> dict:
+    limits = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        host, rate = item.split("=", 1)
+        rate, _, burst = rate.partition(":")
+        limits[host.strip()] = (float(rate), float(burst) if burst else float(rate) * 2)
+    return limits
+
+HOST_RATE_LIMITS = parse_host_rate_limits(os.getenv("MELON_HOST_RATE_LIMITS", ""))
+
+# 호스트별 동시 요청 수 범위 (AIMD로 이 범위 안에서 조절)
+MAX_IN_FLIGHT = int(os.getenv("MELON_MAX_IN_FLIGHT", "32"))
+MIN_IN_FLIGHT = int(os.getenv("MELON_MIN_IN_FLIGHT", "2"))
+INITIAL_IN_FLIGHT = int(os.getenv("MELON_INITIAL_IN_FLIGHT", "8"))
+
+# 응답 시간이 이 값(초)을 넘으면 동시 요청 수를 줄임
+LATENCY_TARGET = float(os.getenv("MELON_LATENCY_TARGET", "2.0"))
+
+# 토큰 버킷 + 동시 요청 수 제한
+# 429/5xx/연결 오류가 나면 동시 요청 수를 절반으로 줄이고, 정상 응답이 이어지면 조금씩 늘림
+class HostLimiter:
+    def __init__(self, host, rate=RATE_LIMIT_RPS, burst=RATE_LIMIT_BURST, min_limit=MIN_IN_FLIGHT,
+                 max_limit=MAX_IN_FLIGHT, initial_limit=INITIAL_IN_FLIGHT, latency_target=LATENCY_TARGET):
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.condition = asyncio.Condition()
+
+    # 토큰을 미리 예약하고 차례가 올 때까지 대기 (대기자끼리 경쟁하지 않음)
+    async def _take_token(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            await self._take_token()
+        except BaseException:
+            # 토큰을 기다리다 취소되면 (헤징에서 진 요청, 닫힌 generator 등) 예약한 토큰과 자리를 돌려줌
+            self.tokens = min(self.burst, self.tokens + 1)
+            await self._free_slot()
+            raise
+
+    # 보낼 자리와 토큰이 모두 남아 있으면 True (헤징으로 요청을 더 보내도 되는지 확인)
+    def has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit) and self.tokens >= 1
+
+    # in_flight는 바로 줄이고, 대기자 알림은 취소되더라도 끝까지 실행
+    async def _free_slot(self):
+        self.in_flight -= 1
+        await asyncio.shield(self._notify())
+
+    async def _notify(self):
+        async with self.condition:
+            self.condition.notify_all()
+
+    # status_code가 None이면 연결 오류/타임아웃
+    async def release(self, status_code, latency):
+        now = time.monotonic()
+        if status_code is None or status_code == 429 or status_code >= 500:
+            # 같은 혼잡 상황에서 여러 번 줄이지 않도록 한 번 줄인 뒤 잠시 유지
+            if now - self.last_decrease > self.latency_target:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self.last_decrease = now
+                logger.warning(f"Backing off {self.host}: concurrency limit {self.limit:.1f} (status {status_code})")
+            if status_code == 429:
+                self.tokens = min(self.tokens, 0)
+        elif latency > self.latency_target:
+            self.limit = max(self.min_limit, self.limit * 0.9)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+        await self._free_slot()
+
+    def stats(self):
+        return {"limit": round(self.limit, 2), "in_flight": self.in_flight, "tokens": round(self.tokens, 2)}
+
+_limiters = {}
+
+# 프로세스 전체에서 호스트마다 하나의 제한기를 공유
+def get_limiter(host: str) -> HostLimiter:
+    if host not in _limiters:
+        rate, burst = HOST_RATE_LIMITS.get(host, (RATE_LIMIT_RPS, RATE_LIMIT_BURST))
+        _limiters[host] = HostLimiter(host, rate=rate, burst=burst)
+    return _limiters[host]
+
+def limiter_stats():
+    return {host: limiter.stats() for host, limiter in _limiters.items()}
@@ -0,0 +1,250 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+from crawling.melon.cache import cache_key
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 값이 있으면 크롤러가 받은 응답을 이 디렉터리에 녹화
+MELON_RECORD_DIR = os.getenv("MELON_RECORD_DIR", "")
+
+# 녹화하는 엔드포인트 (그 외 요청은 녹화하지 않음)
+RECORDED_PATHS = (
+    "/artist/detail.htm",
+    "/artist/getArtistFanNTemper.json",
+    "/artist/albumPaging.htm",
+    "/artist/songPaging.htm",
+    "/artist/videoPaging.htm",
+    "/artist/photoPaging.htm",
+    "/commonlike/getAlbumLike.json",
+    "/commonlike/getSongLike.json",
+    "/m6/chart/streaming/card.json",
+    "/cmt/api/api_listCmt.json",
+)
+
+def recording_enabled() -> bool:
+    return bool(MELON_RECORD_DIR)
+
+# 응답 하나를 <녹화 디렉터리>/<URL 키>.json으로 저장 (키는 응답 캐시와 같은 방식)
+def record_response(response: httpx.Response):
+    url = response.request.url
+    if url.path not in RECORDED_PATHS:
+        return
+    os.makedirs(MELON_RECORD_DIR, exist_ok=True)
+    recording = {
+        "url": str(url),
+        "status": response.status_code,
+        "content_type": response.headers.get("Content-Type", "text/html; charset=utf-8"),
+        "body": response.text,
+    }
+    path = os.path.join(MELON_RECORD_DIR, f"{cache_key(str(url))}.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(recording, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+def load_recordings(directory: str):
+    recordings = {}
+    by_path = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            recording = json.load(f)
+        url = httpx.URL(recording["url"])
+        recordings[name[:-5]] = recording
+        by_path.setdefault(f"{url.host}{url.path}", []).append(recording)
+    return recordings, by_path
+
+# 녹화된 응답을 돌려주는 로컬 서버
+# 요청 경로는 /<원래 호스트>/<원래 경로> (client.melon_url 참고)
+# 정확히 같은 요청이 녹화되어 있지 않으면 같은 엔드포인트의 다른 녹화본을 사용
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, directory, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0, rps=0.0):
+        super().__init__((host, port), ReplayHandler)
+        self.recordings, self.by_path = load_recordings(directory)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rps = rps
+        self.tokens = rps
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.counts = {}
+        logger.info(f"Loaded {len(self.recordings)} recordings from {directory}")
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    # rps가 0이면 제한 없음, 넘으면 429
+    def take_token(self) -> bool:
+        if self.rps <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rps, self.tokens + (now - self.updated) * self.rps)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def count(self, status):
+        with self.lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+
+    def find(self, url: str):
+        recording = self.recordings.get(cache_key(url))
+        if recording is None:
+            parsed = httpx.URL(url)
+            candidates = self.by_path.get(f"{parsed.host}{parsed.path}")
+            if candidates:
+                recording = random.choice(candidates)
+        return recording
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 헤더와 본문을 따로 보내므로 Nagle 지연(~40ms)이 응답 시간에 섞이지 않도록 함
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if not server.take_token():
+            self.reply(429, "text/plain", "throttled")
+        elif random.random() < server.error_rate:
+            self.reply(503, "text/plain", "injected error")
+        else:
+            recording = server.find(f"https:/{self.path}")
+            if recording is None:
+                self.reply(404, "text/plain", "no recording")
+            else:
+                self.reply(recording["status"], recording["content_type"], recording["body"])
+
+    def reply(self, status, content_type, body):
+        self.server.count(status)
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+# 실제 멜론에서 한 아티스트의 모든 get_* 응답을 녹화
+async def record(artist_id: str, directory: str):
+    from crawling.melon import cache
+
+    global MELON_RECORD_DIR
+    MELON_RECORD_DIR = directory
+    cache.MELON_CACHE_ENABLED = False
+    await run_crawlers(artist_id)
+
+# 녹화본 서버를 띄우고 get_* 함수별 처리량 측정
+async def bench(artist_id: str, directory: str, **server_options):
+    from crawling.melon import cache, client
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    server = ReplayServer(directory, **server_options).start()
+    client.MELON_BASE_URL = server.base_url
+    cache.MELON_CACHE_ENABLED = False
+
+    def report(name, elapsed):
+        requests = sum(server.counts.values())
+        print(f"{name}: {elapsed:.2f}s, {requests} requests ({requests / elapsed:.0f} req/s), status {server.counts}")
+        server.counts = {}
+
+    await run_crawlers(artist_id, report)
+    server.shutdown()
+
+# get_* 함수를 차례로 실행하고 함수마다 report(이름, 걸린 시간) 호출
+async def run_crawlers(artist_id: str, report=None):
+    from crawling.melon.albums import get_albums
+    from crawling.melon.artist_info import artist_url, get_artist_info
+    from crawling.melon.client import close_client
+    from crawling.melon.comments import get_comments
+    from crawling.melon.photos import get_photos
+    from crawling.melon.songs import get_songs
+    from crawling.melon.videos import get_videos
+
+    albums = []
+
+    async def comments():
+        for album in albums[:5]:
+            await get_comments(artist_id, album["id"])
+
+    async def load_albums():
+        albums.extend(await get_albums(artist_id))
+
+    crawlers = (
+        ("get_artist_info", lambda: get_artist_info(artist_url(artist_id))),
+        ("get_albums", load_albums),
+        ("get_songs", lambda: get_songs(artist_id)),
+        ("get_videos", lambda: get_videos(artist_id)),
+        ("get_photos", lambda: get_photos(artist_id)),
+        ("get_comments (5 albums)", comments),
+    )
+    for name, crawl in crawlers:
+        started = time.monotonic()
+        try:
+            await crawl()
+        except Exception as e:
+            logger.error(f"{name} failed: {e}")
+        if report:
+            report(name, time.monotonic() - started)
+    await close_client()
+
+# python -m crawling.melon.replay record|serve|bench ...
+def main():
+    from process_pool import shutdown_process_pool, start_process_pool
+
+    parser = argparse.ArgumentParser(description="Record and replay Melon responses")
+    parser.add_argument("command", choices=["record", "serve", "bench"])
+    parser.add_argument("--dir", default="melon_recordings")
+    parser.add_argument("--artist-id", default="2403002")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.05, help="random extra latency (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--rps", type=float, default=0.0, help="requests per second before 429 (0 = unlimited)")
+    args = parser.parse_args()
+    server_options = {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate, "rps": args.rps}
+
+    if args.command == "serve":
+        server = ReplayServer(args.dir, port=args.port, **server_options)
+        print(f"Replaying {args.dir} on {server.base_url} (set MELON_BASE_URL={server.base_url})")
+        server.serve_forever()
+        return
+
+    start_process_pool(["cpu"])
+    try:
+        if args.command == "record":
+            asyncio.run(record(args.artist_id, args.dir))
+        else:
+            asyncio.run(bench(args.artist_id, args.dir, **server_options))
+    finally:
+        shutdown_process_pool()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from task_context import get_task_context
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 요청당 최대 시도 횟수와 지수 백오프 범위(초)
+RETRY_MAX_ATTEMPTS = int(os.getenv("MELON_RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.getenv("MELON_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("MELON_RETRY_MAX_DELAY", "10"))
+
+# 작업 하나가 쓸 수 있는 재시도 총 횟수
+RETRY_BUDGET_PER_TASK = int(os.getenv("MELON_RETRY_BUDGET_PER_TASK", "50"))
+
+# 연속 실패가 이 횟수를 넘으면 BREAKER_RESET_TIMEOUT초 동안 요청을 바로 실패시킴
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("MELON_BREAKER_FAILURE_THRESHOLD", "10"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("MELON_BREAKER_RESET_TIMEOUT", "30"))
+
+# 느린 요청에 대해 두 번째 요청을 보내기까지 기다리는 시간(초)
+HEDGE_DELAY = float(os.getenv("MELON_HEDGE_DELAY", "1.0"))
+
+class CrawlerError(Exception):
+    pass
+
+class CircuitOpenError(CrawlerError):
+    pass
+
+class RetryBudgetExceeded(CrawlerError):
+    pass
+
+# 429, 5xx, 연결 오류(status_code None)만 재시도
+def is_retryable(status_code) -> bool:
+    return status_code is None or status_code == 429 or status_code >= 500
+
+# 지수 백오프 + full jitter
+def backoff_delay(attempt: int) -> float:
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+# 실행 중인 작업의 재시도 예산을 하나 사용 (작업 밖에서 호출되면 제한 없음)
+def take_retry() -> bool:
+    context = get_task_context()
+    if context is None:
+        return True
+    remaining = context.setdefault("retry_budget", RETRY_BUDGET_PER_TASK)
+    if remaining <= 0:
+        return False
+    context["retry_budget"] = remaining - 1
+    return True
+
+# 호스트별 서킷 브레이커 (closed -> open -> half_open -> closed)
+class CircuitBreaker:
+    def __init__(self, host, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def before_request(self):
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"Circuit open for {self.host}")
+            self.state = "half_open"
+        if self.state == "half_open":
+            # 한 번에 하나의 요청만 통과시켜 복구 여부 확인
+            if self.probing:
+                raise CircuitOpenError(f"Circuit half-open for {self.host}")
+            self.probing = True
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info(f"Circuit closed for {self.host}")
+        self.state = "closed"
+        self.failures = 0
+        self.probing = False
+
+    # 결과 없이 취소된 요청(헤징 등)은 다음 요청이 다시 확인할 수 있도록 함
+    def cancel_probe(self):
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(f"Circuit opened for {self.host} after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+_breakers = {}
+
+def get_breaker(host: str) -> CircuitBreaker:
+    if host not in _breakers:
+        _breakers[host] = CircuitBreaker(host)
+    return _breakers[host]
+
+# 멱등 요청을 delay 안에 끝나지 않으면 한 번 더 보내고 먼저 성공한 응답 사용
+# make_request(admitted)는 요청이 실제로 나가는 시점(속도 제한 통과)에 admitted를 set하고,
+# delay는 그때부터 셈 (자체 대기열에서 기다린 시간으로 중복 요청을 보내지 않도록)
+# should_hedge()가 False면 두 번째 요청 없이 첫 요청을 기다림
+async def hedged(make_request, delay=HEDGE_DELAY, should_hedge=None):
+    admitted = asyncio.Event()
+    tasks = [asyncio.create_task(make_request(admitted))]
+    admitted_waiter = asyncio.create_task(admitted.wait())
+    try:
+        await asyncio.wait([tasks[0], admitted_waiter], return_when=asyncio.FIRST_COMPLETED)
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done or (should_hedge is not None and not should_hedge()):
+            return await tasks[0]
+
+        tasks.append(asyncio.create_task(make_request(asyncio.Event())))
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        # 둘 다 실패하면 먼저 보낸 요청의 오류를 전달
+        return tasks[0].result()
+    finally:
+        admitted_waiter.cancel()
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -1,13 +1,21 @@
-import httpx
-from bs4 import BeautifulSoup
-from fastapi import HTTPException
 import logging
 import asyncio
+import os
+from task_context import report_progress, report_result
+from crawling.melon.cache import parse_cached
+from crawling.melon.client import fetch, fetch_cached
+from crawling.melon.retry import CircuitOpenError, CrawlerError, RetryBudgetExceeded
+from crawling.melon.parsers import parse_song_list
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# card.json을 동시에 조회하는 워커 수 (호스트별 속도 제한은 client.request에서 따로 적용)
+# 전체 시간은 워커 수가 아니라 m2.melon.com의 속도 제한으로 정해짐: 기본 20rps면 2,000곡에 약 100초
+# 더 빨리 끝내려면 MELON_HOST_RATE_LIMITS로 m2.melon.com 예산을 따로 설정
+SONG_STATS_CONCURRENCY = int(os.getenv("SONG_STATS_CONCURRENCY", "16"))
+
 # 숫자 변환 함수
 def convert_to_int(string: str) -> int:
     characters = ['+', 'K', 'M', 'B']
@@ -24,28 +32,26 @@ def convert_to_int(string: str) -> int:
     return int(number)
 
 # HTTP 요청 비동기 함수
-async def fetch_response(url: str, params: dict, headers: dict) -> dict:
-    async with httpx.AsyncClient() as client:
-        try:
-            logger.info(f"Sending request to {url} with params: {params}")
-            response = await client.get(url, params=params, headers=headers)
-            response.raise_for_status()
-
-            logger.debug(f"Response content: {response.text[:100]}...")
-
-            try:
-                return response.json()
-            except ValueError as json_error:
-                logger.warning(f"Failed to parse JSON from response, assuming HTML: {json_error}")
-                return response.text
-
-        except httpx.HTTPStatusError as http_error:
-            logger.error(f"HTTP error occurred: {http_error}")
-            raise HTTPException(status_code=500, detail=f"HTTP error occurred: {http_error}")
-
-async def get_song(song_id, song_title, artist_list, hearts_for_songs, artist_id, headers):
+async def fetch_response(url: str, params: dict, headers: dict, hedge: bool = False) -> dict:
+    try:
+        logger.info(f"Sending request to {url} with params: {params}")
+        response = await fetch(url, params=params, headers=headers, hedge=hedge)
+    except CrawlerError as e:
+        logger.error(f"Failed to fetch {url}: {e}")
+        raise
+
+    logger.debug(f"Response content: {response.text[:100]}...")
+
+    try:
+        return response.json()
+    except ValueError as json_error:
+        logger.warning(f"Failed to parse JSON from response, assuming HTML: {json_error}")
+        return response.text
+
+# 곡별 스트리밍 통계(card.json) 조회
+async def get_song_stats(song_id, headers):
     api_url = f'https://m2.melon.com/m6/chart/streaming/card.json?cpId=AS40&cpKey=14LNC3&appVer=6.0.0&songId={song_id}'
-    api_response = await fetch_response(api_url, {}, headers)
+    api_response = await fetch_response(api_url, {}, headers, hedge=True)
     api_data = api_response['response']
 
     listeners, streams = 0, 0
@@ -54,21 +60,83 @@ async def get_song(song_id, song_title, artist_list, hearts_for_songs, artist_id
             listeners = convert_to_int(api_data['STREAMUSER'])
         if api_data['STREAMCOUNT'] != '':
             streams = convert_to_int(api_data['STREAMCOUNT'])
+    return listeners, streams
 
-    individual_song_data = {
-        'id': song_id,
-        'song_title': song_title,
-        'artist': artist_list,
-        'likes': hearts_for_songs.get(song_id, 0),
-        'listeners': listeners,
-        'streams': streams,
-        'artist_id': artist_id
-    }
-
-    return individual_song_data
-
-# 노래 데이터 수집 함수
-async def get_songs(artist_id: str) -> dict:
+# 좋아요 수를 100곡 단위로 동시에 조회해 ({곡 ID: 좋아요 수}, 조회에 실패한 곡 ID 집합) 반환
+async def fetch_song_likes(song_list, melon_headers):
+    song_url = 'https://www.melon.com/commonlike/getSongLike.json'
+    song_id_chunks = list(chunks(song_list, 100))
+    responses = await asyncio.gather(
+        *(fetch_response(song_url, {'contsIds': song_ids}, melon_headers) for song_ids in song_id_chunks),
+        return_exceptions=True,
+    )
+
+    hearts_for_songs, failed_songs = {}, set()
+    for song_ids, response in zip(song_id_chunks, responses):
+        if isinstance(response, (RetryBudgetExceeded, CircuitOpenError)):
+            raise response
+        if isinstance(response, Exception):
+            logger.warning(f"Failed to fetch like counts for {len(song_ids)} songs: {response}")
+            failed_songs.update(song_ids)
+            continue
+        for h in response['contsLike']:
+            hearts_for_songs[str(h['CONTSID'])] = h['SUMMCNT']
+    return hearts_for_songs, failed_songs
+
+# 곡별 스트리밍 통계를 최대 SONG_STATS_CONCURRENCY개 워커로 조회해 끝나는 순서대로 (곡 ID, 통계) 내보냄
+# 곡 하나의 실패는 그 곡만 None으로 처리하고, 재시도 예산 소진/서킷 오픈은 전체 실패로 처리
+async def iter_song_stats(song_list, melon_headers):
+    queue = asyncio.Queue()
+    for song_id in song_list:
+        queue.put_nowait(song_id)
+
+    # 소비하는 쪽이 느리면 워커도 기다리도록 결과 대기열 크기를 제한
+    results = asyncio.Queue(maxsize=SONG_STATS_CONCURRENCY)
+    done, failed = 0, 0
+
+    async def stats_worker():
+        nonlocal done, failed
+        while not queue.empty():
+            song_id = queue.get_nowait()
+            try:
+                stats = await get_song_stats(song_id, melon_headers)
+            except (RetryBudgetExceeded, CircuitOpenError):
+                raise
+            except Exception as e:
+                logger.warning(f"Failed to fetch stats for song {song_id}: {e}")
+                stats = None
+                failed += 1
+            done += 1
+            report_progress("songs", done, len(song_list))
+            await results.put((song_id, stats))
+
+    # 끝나거나 실패하면 소비하는 쪽에 None을 보냄 (취소된 경우에는 받는 쪽이 없으므로 보내지 않음)
+    async def run_workers():
+        try:
+            await asyncio.gather(*workers)
+        except Exception:
+            await results.put(None)
+            raise
+        await results.put(None)
+
+    workers = [asyncio.create_task(stats_worker()) for _ in range(min(SONG_STATS_CONCURRENCY, len(song_list)))]
+    runner = asyncio.create_task(run_workers())
+    try:
+        while (result := await results.get()) is not None:
+            yield result
+        await runner
+    finally:
+        runner.cancel()
+        for worker in workers:
+            worker.cancel()
+
+    if failed:
+        logger.warning(f"Stats missing for {failed} of {len(song_list)} songs")
+
+# 노래 데이터를 통계 조회가 끝나는 순서대로 하나씩 내보냄
+# 조회에 실패한 통계(likes 또는 listeners/streams)는 0으로 채우지 않고 필드를 빼서 저장된 값을 덮어쓰지 않도록 함
+# 누락된 곡 수는 작업 결과(songs_missing_stats, songs_missing_likes)로 보고
+async def iter_songs(artist_id: str):
     logger.info(f"Starting to fetch song data for artist ID: {artist_id}")
     
     melon_headers = {
@@ -77,7 +145,6 @@ async def get_songs(artist_id: str) -> dict:
     }
 
     paging_url = 'https://www.melon.com/artist/songPaging.htm'
-    song_url = 'https://www.melon.com/commonlike/getSongLike.json'
 
     paging_query = {
         'startIndex': '1',
@@ -88,64 +155,58 @@ async def get_songs(artist_id: str) -> dict:
 
     # 아티스트의 노래 목록 크롤링
     logger.info("Fetching song list...")
-    paging_songs = await fetch_response(paging_url, paging_query, melon_headers)
-
-    if isinstance(paging_songs, str):
-        paging_response = BeautifulSoup(paging_songs, 'html.parser')
-    else:
-        logger.error("Expected JSON response but received something else.")
-        raise HTTPException(status_code=500, detail="Unexpected response format")
-
-    artist_list, song_list, song_titles = [], [], []
-    for tr in paging_response.select('div.tb_list table tbody tr'):
-        # 아티스트 이름 추출
-        artist_name_elem = tr.select('td.t_left div.wrap.wrapArtistName #artistName a')
-        if artist_name_elem:
-            artist_feat = artist_name_elem[0].text
-            artist_list.append(artist_feat)
-        else:
-            logger.warning(f"Artist name not found in tr: {tr}")
-
-        # 곡 ID 및 제목 추출
-        song_button_elem = tr.select('button.btn_icon.like')
-        if song_button_elem:
-            song_id = song_button_elem[0].attrs['data-song-no']
-            song_title = song_button_elem[0].attrs['title']
-            song_list.append(song_id)
-            song_titles.append(song_title)
-        else:
-            logger.warning(f"Song button not found in tr: {tr}")
-            continue  # song_button_elem이 없으면 다음 tr로 넘어감
-
-    total_hearts, total_listeners, total_streams = 0, 0, 0
-    song_data = []
-
-    logger.info("Fetching like counts for songs...")
-    hearts_for_songs = {}
-    for song_ids in chunks(song_list, 100):
-        song_id_params = {'contsIds': song_ids}
-        hearts_song = await fetch_response(song_url, song_id_params, melon_headers)
-        for h in hearts_song['contsLike']:
-            hearts_for_songs[str(h['CONTSID'])] = h['SUMMCNT']
-            hearts = h['SUMMCNT']
-            total_hearts += hearts
-
-    logger.info("Fetching listener and stream counts for songs...")
-    tasks = []
-    for song_id, song_title in zip(song_list, song_titles):
-        task = asyncio.create_task(get_song(song_id, song_title, artist_feat, hearts_for_songs, artist_id, melon_headers))
-        tasks.append(task)
+    paging_response = await fetch_cached(paging_url, params=paging_query, headers=melon_headers)
+    artist_list, song_list, song_titles = await parse_cached(parse_song_list, paging_response)
+    artist_feat = artist_list[-1] if artist_list else None
+    titles = dict(zip(song_list, song_titles))
+
+    # 좋아요 수와 스트리밍 통계를 동시에 조회
+    logger.info("Fetching like, listener and stream counts for songs...")
+    likes_task = asyncio.create_task(fetch_song_likes(song_list, melon_headers))
+    song_stats = iter_song_stats(song_list, melon_headers)
+    missing_stats, missing_likes = 0, 0
+    try:
+        hearts_for_songs = None
+        async for song_id, stats in song_stats:
+            if hearts_for_songs is None:
+                hearts_for_songs, failed_likes = await likes_task
+            song = {
+                'id': song_id,
+                'song_title': titles[song_id],
+                'artist': artist_feat,
+                'artist_id': artist_id
+            }
+            if song_id in failed_likes:
+                missing_likes += 1
+            else:
+                song['likes'] = hearts_for_songs.get(song_id, 0)
+            if stats is None:
+                missing_stats += 1
+            else:
+                song['listeners'], song['streams'] = stats
+            yield song
+        if missing_stats or missing_likes:
+            logger.warning(f"Songs for artist {artist_id} saved without stats: {missing_stats} missing listeners/streams, {missing_likes} missing likes")
+        report_result(songs_missing_stats=missing_stats, songs_missing_likes=missing_likes)
+    finally:
+        await song_stats.aclose()
+        likes_task.cancel()
 
-    song_data = await asyncio.gather(*tasks)
+# 노래 데이터 수집 함수
+async def get_songs(artist_id: str) -> dict:
+    song_data = [song async for song in iter_songs(artist_id)]
 
+    # 통계 조회에 실패한 곡은 합계에서 빠지므로 그 수를 함께 반환
     result = {
-        'total_hearts': total_hearts,
-        'total_listeners': total_listeners,
-        'total_streams': total_streams,
+        'total_hearts': sum(song.get('likes', 0) for song in song_data),
+        'total_listeners': sum(song.get('listeners', 0) for song in song_data),
+        'total_streams': sum(song.get('streams', 0) for song in song_data),
+        'missing_likes': sum('likes' not in song for song in song_data),
+        'missing_stats': sum('listeners' not in song for song in song_data),
         'songs': song_data
     }
 
-    logger.info(f"Result : {result}")
+    logger.info(f"Fetched {len(song_data)} songs for artist ID: {artist_id}")
 
     return result
 
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# load_* 결과를 프로세스 메모리에 보관하는 시간(초)과 최대 항목 수, LOAD_CACHE_TTL이 0이면 캐시하지 않음
+# 저장은 같은 프로세스의 크롤링 작업에서 하므로 save_*가 해당 항목을 바로 무효화하고, TTL은 다른 프로세스에서 바뀐 경우의 상한
+LOAD_CACHE_TTL = float(os.getenv("LOAD_CACHE_TTL", "300"))
+LOAD_CACHE_MAX_ENTRIES = int(os.getenv("LOAD_CACHE_MAX_ENTRIES", "1024"))
+
+# 보관한 결과의 전체 크기 상한과 항목 하나의 크기 상한(바이트, JSON으로 직렬화한 크기로 추정)
+# 이보다 큰 결과(인기 아티스트의 전체 댓글 목록 등)는 보관하지 않고 매번 Firestore에서 읽음
+LOAD_CACHE_MAX_BYTES = int(os.getenv("LOAD_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LOAD_CACHE_MAX_ENTRY_BYTES = int(os.getenv("LOAD_CACHE_MAX_ENTRY_BYTES", str(4 * 1024 * 1024)))
+
+# 크기를 추정할 때 목록에서 고르게 골라 볼 문서 수
+SIZE_SAMPLE = 32
+
+# JSON으로 직렬화했을 때의 대략적인 크기(바이트), 긴 목록은 SIZE_SAMPLE개 문서의 평균 크기 x 문서 수로 추정
+# 큰 결과 전체를 json.dumps로 직렬화하느라 이벤트 루프를 막지 않도록, limit을 넘으면 바로 중단
+def estimate_size(value, limit):
+    if isinstance(value, (list, tuple)) and len(value) > SIZE_SAMPLE:
+        step = len(value) / SIZE_SAMPLE
+        sample = [value[int(i * step)] for i in range(SIZE_SAMPLE)]
+        return int(estimate_size(sample, limit) / SIZE_SAMPLE * len(value))
+
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            size += len(item) + 2 if item.isascii() else len(item.encode()) + 2
+        elif isinstance(item, dict):
+            size += 2 + 2 * len(item)
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            size += 2 + len(item)
+            stack.extend(item)
+        elif isinstance(item, (bool, int, float)) or item is None:
+            size += 8
+        else:
+            size += len(str(item)) + 2
+        if size > limit:
+            break
+    return size
+
+# (load_* 함수 이름, ID) 키로 load_* 결과를 보관하는 TTL + LRU 캐시 (항목 수와 전체 크기로 제한)
+# 같은 키를 동시에 요청하면 Firestore 조회는 한 번만 하고 결과를 함께 사용
+# 조회 중에 무효화되면 그 결과는 보관하지 않음 (저장 전 데이터가 다시 들어오지 않도록)
+# 보관한 값은 여러 요청이 함께 사용하므로 수정하면 안 됨
+class LoadCache:
+    def __init__(self, ttl=LOAD_CACHE_TTL, max_entries=LOAD_CACHE_MAX_ENTRIES,
+                 max_bytes=LOAD_CACHE_MAX_BYTES, max_entry_bytes=LOAD_CACHE_MAX_ENTRY_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.loading = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expired = 0
+        self.evicted = 0
+        self.invalidated = 0
+        self.too_large = 0
+
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    # 캐시에 있으면 반환하고, 없으면 load()를 실행해 보관 (load가 예외를 내면 보관하지 않음)
+    async def get(self, key, load):
+        if not self.enabled():
+            return await load()
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, value, _ = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self._remove(key)
+            self.expired += 1
+
+        future = self.loading.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.loading[key] = future
+        try:
+            value = await load()
+        except BaseException as e:
+            if self.loading.get(key) is future:
+                del self.loading[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # 기다리는 요청이 없으면 future의 예외를 가져가지 않았다는 경고가 나오지 않도록 처리
+                future.exception()
+            raise
+
+        if self.loading.get(key) is future:
+            del self.loading[key]
+            self.put(key, value)
+        future.set_result(value)
+        return value
+
+    def put(self, key, value):
+        size = estimate_size(value, self.max_entry_bytes)
+        if size > self.max_entry_bytes:
+            self.too_large += 1
+            return
+        self._remove(key)
+        self.entries[key] = (time.monotonic() + self.ttl, value, size)
+        self.total_bytes += size
+        while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.evicted += 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[2]
+        return entry is not None
+
+    # 보관한 값과 진행 중인 조회를 버림 (이후 요청은 Firestore에서 다시 읽음)
+    # (함수 이름, ID)로 시작하는 키(필드를 골라 읽은 결과)도 함께 버림
+    def invalidate(self, *keys):
+        keys = set(keys)
+        for key in [key for key in self.entries if key[:2] in keys]:
+            self._remove(key)
+            self.invalidated += 1
+        for key in [key for key in self.loading if key[:2] in keys]:
+            del self.loading[key]
+
+    def stats(self):
+        requests = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / requests, 4) if requests else None,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "invalidated": self.invalidated,
+            "too_large": self.too_large,
+        }
+
+load_cache = LoadCache()
+
+def load_cache_stats():
+    return load_cache.stats()
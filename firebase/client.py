@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+import firebase_admin
+from firebase_admin import credentials, firestore_async
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FIREBASE_CREDENTIALS = os.getenv("FIREBASE_CREDENTIALS", "/etc/secrets/firebase-service-account-key.json")
+
+# 값이 있으면 로컬 Firestore 에뮬레이터 사용 (예: localhost:8080, 인증 정보 불필요)
+FIRESTORE_EMULATOR_HOST = os.getenv("FIRESTORE_EMULATOR_HOST", "")
+FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID", "demo-rs-valuation")
+
+_db = None
+
+def initialize_app():
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(FIREBASE_CREDENTIALS)
+        firebase_admin.initialize_app(cred)
+
+# 프로세스 전체에서 공유하는 비동기 Firestore 클라이언트 (처음 사용할 때 생성)
+# 요청마다 스레드를 쓰지 않으므로 동시 요청 수가 스레드 풀 크기에 묶이지 않음
+def get_db():
+    global _db
+    if _db is None:
+        if FIRESTORE_EMULATOR_HOST:
+            from google.auth.credentials import AnonymousCredentials
+            from google.cloud.firestore import AsyncClient
+
+            _db = AsyncClient(project=FIREBASE_PROJECT_ID, credentials=AnonymousCredentials())
+            logger.info(f"Using Firestore emulator at {FIRESTORE_EMULATOR_HOST}")
+        else:
+            initialize_app()
+            _db = firestore_async.client()
+    return _db
+
+# load_page로 마지막 페이지까지 읽어 문서 목록과 페이지 수 반환
+async def read_all_pages(collection: str, field: str, value, limit: int):
+    from firebase.load import load_page
+
+    documents, pages, start_after = [], 0, None
+    while True:
+        page, start_after = await load_page(collection, field, value, limit, start_after)
+        documents.extend(page)
+        pages += 1
+        if start_after is None:
+            return documents, pages
+
+# 에뮬레이터에 저장 후 다시 읽어 save_*(bulk_write 배치 분할, merge 저장 포함)/load_*/필드 선택/페이지 조회/스트리밍/캐시 무효화 결과 확인
+# FIRESTORE_EMULATOR_HOST=localhost:8080 python -m firebase.client
+async def check_emulator():
+    from firebase.load import load_album_comments, load_artist, load_artist_albums, load_artist_songs, load_comment_watermarks, load_page, stream_documents
+    from firebase.save import save_albums, save_artist, save_comment_watermark, save_comments, save_songs
+
+    artist_id = "emulator-artist"
+    albums = [{"id": f"emulator-album-{i}", "artist_id": artist_id, "album_name": f"Album {i}"} for i in range(3)]
+    comments = [{"id": 1000 + i, "artist_id": artist_id, "album_id": albums[0]["id"], "content": f"comment {i}"} for i in range(1200)]
+
+    checks = {
+        "save_artist": await save_artist({"id": artist_id, "artist_name": "Emulator"}),
+        "save_albums": await save_albums(albums),
+        "save_comments": await save_comments(comments),
+        "save_comment_watermark": await save_comment_watermark(artist_id, albums[0]["id"], 2199, "2024.01.01"),
+    }
+    checks["load_artist"] = (await load_artist(artist_id) or {}).get("artist_name") == "Emulator"
+    checks["load_artist_albums"] = sorted(album["id"] for album in await load_artist_albums(artist_id)) == [album["id"] for album in albums]
+    checks["load_album_comments"] = len(await load_album_comments(albums[0]["id"])) == len(comments)
+    checks["load_comment_watermarks"] = (await load_comment_watermarks(artist_id)) == {albums[0]["id"]: 2199}
+
+    # 1,200개 댓글은 bulk_write에서 여러 배치로 나뉘어 저장됨: 페이지를 이어 읽어 빠지거나 겹친 문서가 없는지 확인
+    paged, pages = await read_all_pages('comments', 'album_id', albums[0]["id"], 500)
+    checks["load_page"] = pages == 3 and sorted(doc["content"] for doc in paged) == sorted(comment["content"] for comment in comments)
+    streamed = [doc async for doc in stream_documents('comments', 'album_id', albums[0]["id"])]
+    checks["stream_documents"] = len(streamed) == len(comments)
+
+    # 필드를 골라 읽으면 고른 필드만 반환, 최신순 페이지는 updatedAt 내림차순
+    selected = await load_album_comments(albums[0]["id"], ['id', 'content'])
+    checks["select_fields"] = len(selected) == len(comments) and all(set(doc) == {'id', 'content'} for doc in selected)
+    latest, _ = await load_page('comments', 'artist_id', artist_id, 50, latest=True)
+    checks["load_page_latest"] = len(latest) == 50 and all(a['updatedAt'] >= b['updatedAt'] for a, b in zip(latest, latest[1:]))
+
+    # 통계가 빠진 곡 레코드는 merge로 저장되어 기존 통계를 유지해야 함
+    song = {"id": "emulator-song", "artist_id": artist_id, "song_title": "Song", "likes": 1, "listeners": 2, "streams": 3}
+    await save_songs([song])
+    await save_songs([{"id": song["id"], "artist_id": artist_id, "song_title": "Song", "likes": 5}])
+    stored = (await load_artist_songs(artist_id) or [{}])[0]
+    checks["save_songs_merge"] = (stored.get("likes"), stored.get("listeners"), stored.get("streams")) == (5, 2, 3)
+
+    # 다시 저장하면 캐시된 load_* 결과가 무효화되어 새 값을 읽어야 함
+    await save_artist({"id": artist_id, "artist_name": "Emulator 2"})
+    checks["load_cache_invalidation"] = (await load_artist(artist_id) or {}).get("artist_name") == "Emulator 2"
+
+    for name, ok in checks.items():
+        print(f"{name}: {'ok' if ok else 'FAILED'}")
+    return all(checks.values())
+
+if __name__ == "__main__":
+    if not FIRESTORE_EMULATOR_HOST:
+        raise SystemExit("Set FIRESTORE_EMULATOR_HOST to run against the Firestore emulator")
+    raise SystemExit(0 if asyncio.run(check_emulator()) else 1)
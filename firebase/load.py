@@ -1,156 +1,251 @@
-import firebase_admin
-from firebase_admin import firestore, credentials
-import asyncio
+from firebase_admin import firestore
 import logging
-import datetime
-from datetime import timedelta
+import os
+from firebase.cache import load_cache
+from firebase.client import get_db
 
 logger = logging.getLogger(__name__)
 
-if not firebase_admin._apps:
-
-    cred = credentials.Certificate('/etc/secrets/firebase-service-account-key.json')
-    firebase_admin.initialize_app(cred)
-
-async def load_artist(artist_id: str):
-    try:
-        db = firestore.client()
+# 최신 댓글 조회에서 돌려주는 최대 댓글 수
+LATEST_COMMENTS_LIMIT = int(os.getenv("LATEST_COMMENTS_LIMIT", "100"))
+
+# 대시보드 표에서 쓰는 필드만 읽는 조회 방식 (view 이름 -> 필드 목록), fields와 함께 주면 합쳐서 사용
+LOAD_VIEWS = {
+    'artists': {'slim': ['id', 'artist_name', 'img', 'followers']},
+    'albums': {'slim': ['id', 'album_name', 'release_date', 'like_count', 'total_songs']},
+    'songs': {'slim': ['id', 'song_title', 'likes', 'listeners', 'streams']},
+    'videos': {'slim': ['id', 'title', 'view_count']},
+    'photos': {'slim': ['id', 'title']},
+    'comments': {'slim': ['id', 'album_id', 'display_date', 'recommendations', 'non_recommendations']},
+}
+
+# fields(쉼표로 구분한 필드 이름)와 view를 합친 필드 목록, 둘 다 없으면 None (문서 전체)
+# 없는 view 이름이면 ValueError
+def projection(collection: str, fields=None, view=None):
+    selected = []
+    if view:
+        views = LOAD_VIEWS.get(collection, {})
+        if view not in views:
+            raise ValueError(f"Unknown view for {collection}: {view} (available: {', '.join(views) or 'none'})")
+        selected.extend(views[view])
+    if fields:
+        selected.extend(field.strip() for field in fields.split(',') if field.strip())
+    return tuple(dict.fromkeys(selected)) or None
+
+# fields가 있으면 그 필드만 Firestore에서 읽음 (읽는 양과 응답 크기 감소)
+def select_fields(query, fields=None):
+    return query.select(fields) if fields else query
+
+# 캐시 키: (함수 이름, ID), 필드를 골라 읽은 결과는 (함수 이름, ID, 필드 목록)
+# save_*가 (함수 이름, ID)로 무효화하면 필드별 결과도 함께 무효화됨
+def load_key(name: str, value, fields=None):
+    key = (name, None if value is None else str(value))
+    return key + (tuple(fields),) if fields else key
+
+# 조회 결과는 load_cache에 보관하고, 같은 데이터를 저장하는 save_*가 무효화
+async def load_artist(artist_id: str, fields=None):
+    async def fetch():
+        db = get_db()
         doc_ref = db.collection('artists').document(artist_id)
         
-        doc = await asyncio.to_thread(doc_ref.get)
+        doc = await doc_ref.get(field_paths=fields)
 
         if doc.exists:
             artist_data = doc.to_dict()
             return artist_data
         else:
             return None
+
+    try:
+        return await load_cache.get(load_key('load_artist', artist_id, fields), fetch)
     except Exception as e:
         return None
     
-async def load_all_artists():
-    try:
-        db = firestore.client()
+async def load_all_artists(fields=None):
+    async def fetch():
+        db = get_db()
 
         artists_ref = db.collection('artists')
-        docs = await asyncio.to_thread(artists_ref.stream)
-
         artists = []
-        for doc in docs:
+        async for doc in select_fields(artists_ref, fields).stream():
             artist = doc.to_dict()
             artists.append(artist)
 
         return artists
+
+    try:
+        return await load_cache.get(load_key('load_all_artists', None, fields), fetch)
     except Exception as e:
         print(f"Failed to load artists from Firebase: {e}")
         return None
 
-async def load_artist_albums(artist_id):
-    try:
-        db = firestore.client()
+async def load_artist_albums(artist_id, fields=None):
+    async def fetch():
+        db = get_db()
         
         songs_ref = db.collection('albums')
         query = songs_ref.where('artist_id', '==', artist_id)
-        docs = await asyncio.to_thread(query.stream)
-
-        albums = [doc.to_dict() for doc in docs]
+        query = select_fields(query, fields)
+        albums = [doc.to_dict() async for doc in query.stream()]
 
         return albums
+
+    try:
+        return await load_cache.get(load_key('load_artist_albums', artist_id, fields), fetch)
     except Exception as e:
         print(f"Failed to load albums from Firestore: {str(e)}")
         return []
 
-async def load_artist_songs(artist_id):
-    try:
-        db = firestore.client()
+async def load_artist_songs(artist_id, fields=None):
+    async def fetch():
+        db = get_db()
         
         songs_ref = db.collection('songs')
         query = songs_ref.where('artist_id', '==', artist_id)
-        docs = await asyncio.to_thread(query.stream)
-
-        songs = [doc.to_dict() for doc in docs]
+        query = select_fields(query, fields)
+        songs = [doc.to_dict() async for doc in query.stream()]
 
         return songs
+
+    try:
+        return await load_cache.get(load_key('load_artist_songs', artist_id, fields), fetch)
     except Exception as e:
         print(f"Failed to load songs from Firestore: {str(e)}")
         return []
     
-async def load_artist_videos(artist_id):
-    try:
-        db = firestore.client()
+async def load_artist_videos(artist_id, fields=None):
+    async def fetch():
+        db = get_db()
         
         videos_ref = db.collection('videos')
         query = videos_ref.where('artist_id', '==', artist_id)
-        docs = await asyncio.to_thread(query.stream)
-
-        videos = [doc.to_dict() for doc in docs]
+        query = select_fields(query, fields)
+        videos = [doc.to_dict() async for doc in query.stream()]
 
         return videos
+
+    try:
+        return await load_cache.get(load_key('load_artist_videos', artist_id, fields), fetch)
     except Exception as e:
         print(f"Failed to load videos from Firestore: {str(e)}")
         return []
     
-async def load_artist_photos(artist_id):
-    try:
-        db = firestore.client()
+async def load_artist_photos(artist_id, fields=None):
+    async def fetch():
+        db = get_db()
         
         photos_ref = db.collection('photos')
         query = photos_ref.where('artist_id', '==', artist_id)
-        docs = await asyncio.to_thread(query.stream)
-
-        photos = [doc.to_dict() for doc in docs]
+        query = select_fields(query, fields)
+        photos = [doc.to_dict() async for doc in query.stream()]
 
         return photos
+
+    try:
+        return await load_cache.get(load_key('load_artist_photos', artist_id, fields), fetch)
     except Exception as e:
         print(f"Failed to load photos from Firestore: {str(e)}")
         return []
     
-async def load_album_comments(album_id):
-    try:
-        db = firestore.client()
+async def load_album_comments(album_id, fields=None):
+    async def fetch():
+        db = get_db()
         
         comments_ref = db.collection('comments')
         query = comments_ref.where('album_id', '==', album_id)
-        docs = await asyncio.to_thread(query.stream)
-
-        comments = [doc.to_dict() for doc in docs]
+        query = select_fields(query, fields)
+        comments = [doc.to_dict() async for doc in query.stream()]
 
         return comments
+
+    try:
+        return await load_cache.get(load_key('load_album_comments', album_id, fields), fetch)
     except Exception as e:
         print(f"Failed to load songs from Firestore: {str(e)}")
         return []
     
-async def load_artist_comments(artist_id):
-    try:
-        db = firestore.client()
+async def load_artist_comments(artist_id, fields=None):
+    async def fetch():
+        db = get_db()
         
         comments_ref = db.collection('comments')
         query = comments_ref.where('artist_id', '==', artist_id)
-        docs = await asyncio.to_thread(query.stream)
-
-        comments = [doc.to_dict() for doc in docs]
+        query = select_fields(query, fields)
+        comments = [doc.to_dict() async for doc in query.stream()]
 
         return comments
+
+    try:
+        return await load_cache.get(load_key('load_artist_comments', artist_id, fields), fetch)
     except Exception as e:
         print(f"Failed to load songs from Firestore: {str(e)}")
         return []
     
-async def load_latest_comments(artist_id):
-    try:
-        db = firestore.client()
+async def load_latest_comments(artist_id, fields=None):
+    async def fetch():
+        db = get_db()
         
         comments_ref = db.collection('comments')
-        query = comments_ref.where('artist_id', '==', artist_id).order_by('updatedAt', direction=firestore.Query.DESCENDING)
-        docs = await asyncio.to_thread(query.stream)
-        comments = [doc.to_dict() for doc in docs]
+        query = comments_ref.where('artist_id', '==', artist_id).order_by('updatedAt', direction=firestore.Query.DESCENDING).limit(LATEST_COMMENTS_LIMIT)
+        query = select_fields(query, fields)
+        comments = [doc.to_dict() async for doc in query.stream()]
 
         if not comments:
             return None
         
-        for comment in comments:
-            if 'updatedAt' not in comment:
-                comment['updatedAt'] = None
+        if not fields or 'updatedAt' in fields:
+            for comment in comments:
+                if 'updatedAt' not in comment:
+                    comment['updatedAt'] = None
 
         return comments
+
+    try:
+        return await load_cache.get(load_key('load_latest_comments', artist_id, fields), fetch)
     except Exception as e:
         print(f"Failed to load songs from Firestore: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+# 크롤러가 수집 기준으로 사용하므로 캐시하지 않고 항상 Firestore에서 읽음
+# {album_id: last_cmt_seq} (한 번도 수집하지 않은 앨범은 없음)
+# Firestore 오류는 그대로 전달 (빈 결과로 돌려주면 모든 앨범을 처음부터 다시 수집하게 됨)
+async def load_comment_watermarks(artist_id):
+    db = get_db()
+
+    watermarks_ref = db.collection('comment_watermarks')
+    query = watermarks_ref.where('artist_id', '==', artist_id)
+    return {doc.get('album_id'): doc.get('last_cmt_seq') async for doc in query.stream()}
+
+# field == value인 문서 쿼리 (latest=True면 최신 저장순), load_page와 stream_documents에서 사용
+def where_query(collection: str, field: str, value, latest=False, fields=None):
+    query = get_db().collection(collection).where(field, '==', value)
+    if latest:
+        query = query.order_by('updatedAt', direction=firestore.Query.DESCENDING)
+    return select_fields(query, fields)
+
+# 문서를 limit개만 읽고 (문서 목록, 다음 페이지의 start_after) 반환, 마지막 페이지면 start_after는 None
+# start_after는 이전 페이지 마지막 문서의 ID, 없는 문서면 ValueError
+# Firestore 오류는 그대로 전달 (빈 결과로 돌려주면 마지막 페이지와 구분할 수 없음)
+async def load_page(collection: str, field: str, value, limit: int, start_after=None, latest=False, fields=None):
+    query = where_query(collection, field, value, latest, fields).limit(limit)
+    if start_after:
+        cursor = await get_db().collection(collection).document(start_after).get()
+        if not cursor.exists:
+            raise ValueError(f"Unknown start_after: {start_after}")
+        query = query.start_after(cursor)
+
+    snapshots = [doc async for doc in query.stream()]
+    documents = [doc.to_dict() for doc in snapshots]
+    if latest and (not fields or 'updatedAt' in fields):
+        for document in documents:
+            document.setdefault('updatedAt', None)
+    next_start_after = snapshots[-1].id if len(snapshots) == limit else None
+    return documents, next_start_after
+
+# 문서를 목록으로 모으지 않고 Firestore에서 받는 대로 하나씩 내보냄 (Firestore 오류는 그대로 전달)
+async def stream_documents(collection: str, field: str, value, latest=False, fields=None):
+    async for doc in where_query(collection, field, value, latest, fields).stream():
+        document = doc.to_dict()
+        if latest and (not fields or 'updatedAt' in fields):
+            document.setdefault('updatedAt', None)
+        yield document
@@ -1,19 +1,84 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import firestore
 import asyncio
+import json
 import logging
+import os
+import random
+import time
+from firebase.cache import load_cache
+from firebase.client import get_db
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-if not firebase_admin._apps:
+# Firestore batch 한도 (쓰기 500개, 요청 10MiB)보다 작게 나눠서 기록
+FIRESTORE_BATCH_MAX_WRITES = int(os.getenv("FIRESTORE_BATCH_MAX_WRITES", "500"))
+FIRESTORE_BATCH_MAX_BYTES = int(os.getenv("FIRESTORE_BATCH_MAX_BYTES", str(9 * 1024 * 1024)))
 
-    cred = credentials.Certificate('/etc/secrets/firebase-service-account-key.json')
-    firebase_admin.initialize_app(cred)
+# 동시에 커밋하는 batch 수와 실패한 batch의 재시도 횟수
+FIRESTORE_WRITE_CONCURRENCY = int(os.getenv("FIRESTORE_WRITE_CONCURRENCY", "4"))
+FIRESTORE_WRITE_RETRIES = int(os.getenv("FIRESTORE_WRITE_RETRIES", "3"))
+
+# 문서 크기 추정 (정확한 값이 아니라 batch를 나누기 위한 상한 계산용)
+def estimate_size(doc_id: str, data: dict) -> int:
+    return len(doc_id) + len(json.dumps(data, default=str, ensure_ascii=False).encode()) + 64
+
+# [(문서 ID, 데이터)]를 쓰기 수/바이트 한도를 넘지 않는 묶음으로 나눔
+def chunk_writes(docs: list) -> list:
+    chunks, chunk, chunk_bytes = [], [], 0
+    for doc_id, data in docs:
+        size = estimate_size(doc_id, data)
+        if chunk and (len(chunk) >= FIRESTORE_BATCH_MAX_WRITES or chunk_bytes + size > FIRESTORE_BATCH_MAX_BYTES):
+            chunks.append(chunk)
+            chunk, chunk_bytes = [], 0
+        chunk.append((doc_id, data))
+        chunk_bytes += size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+# 묶음별로 batch를 만들어 최대 FIRESTORE_WRITE_CONCURRENCY개씩 동시에 (비동기로) 커밋하고, 실패한 묶음만 다시 커밋
+# merge가 True면 문서를 덮어쓰지 않고 data에 있는 필드만 갱신
+# 모든 묶음이 저장되면 True
+async def bulk_write(collection: str, docs: list, merge: bool = False) -> bool:
+    db = get_db()
+    chunks = chunk_writes(docs)
+    semaphore = asyncio.Semaphore(FIRESTORE_WRITE_CONCURRENCY)
+    started = time.monotonic()
+
+    async def commit_chunk(index, chunk):
+        async with semaphore:
+            for attempt in range(FIRESTORE_WRITE_RETRIES + 1):
+                batch = db.batch()
+                for doc_id, data in chunk:
+                    batch.set(db.collection(collection).document(doc_id), data, merge=merge)
+                chunk_started = time.monotonic()
+                try:
+                    await batch.commit()
+                    logger.info(f"Committed {len(chunk)} {collection} ({index + 1}/{len(chunks)}) in {(time.monotonic() - chunk_started) * 1000:.0f}ms")
+                    return True
+                except Exception as e:
+                    logger.warning(f"Failed to commit {len(chunk)} {collection} ({index + 1}/{len(chunks)}, attempt {attempt + 1}): {e}")
+                    if attempt < FIRESTORE_WRITE_RETRIES:
+                        await asyncio.sleep(random.uniform(0, 0.5 * 2 ** attempt))
+            return False
+
+    results = await asyncio.gather(*(commit_chunk(index, chunk) for index, chunk in enumerate(chunks)))
+    elapsed = time.monotonic() - started
+    failed = results.count(False)
+    if docs:
+        logger.info(f"Wrote {len(docs)} {collection} in {len(chunks)} batches, {elapsed:.2f}s ({len(docs) / max(elapsed, 1e-6):.0f} writes/s), {failed} batches failed")
+    return failed == 0
+
+# 저장한 레코드의 field 값(아티스트/앨범 ID)별로 loads에 해당하는 load_* 캐시 항목을 무효화
+# 일부 batch만 저장된 경우도 있으므로 성공 여부와 관계없이 호출
+def invalidate_loads(loads: tuple, field: str, records: list):
+    ids = {str(record.get(field)) for record in records}
+    load_cache.invalidate(*((load, record_id) for load in loads for record_id in ids))
 
 async def save_artist(artist: dict) -> bool:
     try:
-        db = firestore.client()
+        db = get_db()
         collection_ref = db.collection('artists')
         artist_id = artist['id']
         artist_data = {
@@ -21,96 +86,83 @@ async def save_artist(artist: dict) -> bool:
             'updatedAt': firestore.SERVER_TIMESTAMP
         }
 
-        await asyncio.to_thread(collection_ref.document(artist_id).set, artist_data)
+        await collection_ref.document(artist_id).set(artist_data)
         return True
     except Exception as e:
         return False
+    finally:
+        load_cache.invalidate(('load_artist', str(artist.get('id'))), ('load_all_artists', None))
     
 async def save_albums(albums: list) -> bool:
     try:
-        db = firestore.client()
-        batch = db.batch()
-
-        for album in albums:
-            album_ref = db.collection('albums').document(album['id'])
-            album_data = {
-                **album,
-                'updatedAt': firestore.SERVER_TIMESTAMP
-            }
-            batch.set(album_ref, album_data)
-
-        await asyncio.to_thread(batch.commit)
-        return True
+        docs = [(album['id'], {**album, 'updatedAt': firestore.SERVER_TIMESTAMP}) for album in albums]
+        return await bulk_write('albums', docs)
     except Exception as e:
+        logger.error(f"Failed to save albums: {e}")
         return False
+    finally:
+        invalidate_loads(('load_artist_albums',), 'artist_id', albums)
     
 async def save_songs(songs: list) -> bool:
     try:
-        db = firestore.client()
-        batch = db.batch()
-
-        for song in songs:
-            song_ref = db.collection('songs').document(str(song['id']))
-            batch.set(song_ref, song)
-
-        await asyncio.to_thread(batch.commit)
-        return True
+        # 조회에 실패한 통계 필드는 레코드에 없으므로 merge로 저장해 기존 값을 유지
+        docs = [(str(song['id']), song) for song in songs]
+        return await bulk_write('songs', docs, merge=True)
     except Exception as e:
+        logger.error(f"Failed to save songs: {e}")
         return False
+    finally:
+        invalidate_loads(('load_artist_songs',), 'artist_id', songs)
     
 async def save_videos(videos: list) -> bool:
     try:
         for video in videos:
             logger.info(f"Videos from save_videos: {video}")
             
-        db = firestore.client()
-        batch = db.batch()
-
-        for video in videos:
-            video_ref = db.collection('videos').document(video['id'])
-            video_data = {
-                **video,
-                'updatedAt': firestore.SERVER_TIMESTAMP
-            }
-            batch.set(video_ref, video_data)
-
-        await asyncio.to_thread(batch.commit)
-        return True
+        docs = [(video['id'], {**video, 'updatedAt': firestore.SERVER_TIMESTAMP}) for video in videos]
+        return await bulk_write('videos', docs)
     except Exception as e:
+        logger.error(f"Failed to save videos: {e}")
         return False
+    finally:
+        invalidate_loads(('load_artist_videos',), 'artist_id', videos)
     
 async def save_photos(photos: list) -> bool:
     try:
-        db = firestore.client()
-        batch = db.batch()
-
-        for photo in photos:
-            photo_ref = db.collection('photos').document(photo['id'])
-            photo_data = {
-                **photo,
-                'updatedAt': firestore.SERVER_TIMESTAMP
-            }
-            batch.set(photo_ref, photo_data)
-
-        await asyncio.to_thread(batch.commit)
-        return True
+        docs = [(photo['id'], {**photo, 'updatedAt': firestore.SERVER_TIMESTAMP}) for photo in photos]
+        return await bulk_write('photos', docs)
     except Exception as e:
+        logger.error(f"Failed to save photos: {e}")
         return False
+    finally:
+        invalidate_loads(('load_artist_photos',), 'artist_id', photos)
     
 async def save_comments(comments: list) -> bool:
     try:
-        db = firestore.client()
-        batch = db.batch()
-
-        for comment in comments:
-            comment_ref = db.collection('comments').document(str(comment['id']))
-            comment_data = {
-                **comment,
-                'updatedAt': firestore.SERVER_TIMESTAMP
-            }
-            batch.set(comment_ref, comment_data)
+        docs = [(str(comment['id']), {**comment, 'updatedAt': firestore.SERVER_TIMESTAMP}) for comment in comments]
+        return await bulk_write('comments', docs)
+    except Exception as e:
+        logger.error(f"Failed to save comments: {e}")
+        return False
+    finally:
+        invalidate_loads(('load_artist_comments', 'load_latest_comments'), 'artist_id', comments)
+        invalidate_loads(('load_album_comments',), 'album_id', comments)
+    
+# 앨범별로 저장까지 끝난 가장 최신 댓글 (다음 수집은 이 댓글 이후만 가져옴)
+async def save_comment_watermark(artist_id: str, album_id: str, last_cmt_seq: int, last_display_date) -> bool:
+    try:
+        db = get_db()
+        watermark_ref = db.collection('comment_watermarks').document(str(album_id))
+        watermark_data = {
+            'artist_id': artist_id,
+            'album_id': album_id,
+            'last_cmt_seq': last_cmt_seq,
+            'last_display_date': last_display_date,
+            'updatedAt': firestore.SERVER_TIMESTAMP
+        }
 
-        await asyncio.to_thread(batch.commit)
+        await watermark_ref.set(watermark_data)
         return True
     except Exception as e:
-        return False
\ No newline at end of file
+        logger.error(f"Failed to save comment watermark for album {album_id}: {e}")
+        return False
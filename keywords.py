@@ -0,0 +1,70 @@
+from collections import Counter
+from typing import Any, List, Dict
+from konlpy.tag import Okt
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+_okt = None
+
+# Okt는 생성 시 JVM을 띄우므로 프로세스당 한 번만 생성
+def get_okt() -> Okt:
+    global _okt
+    if _okt is None:
+        _okt = Okt()
+    return _okt
+
+# 프로세스 풀 워커 시작 시 JVM과 형태소 분석기를 미리 준비
+def warm_up():
+    get_okt().pos("준비", stem=True)
+
+def process_keywords(comments: List[Dict[str, Any]], min_frequency: int = 2, min_tfidf = 0.1) -> dict: 
+    okt = get_okt()
+    
+    # 사전에 정의된 불용어 리스트
+    custom_stopwords = set([
+        "하다", "있다", "되다", "이다", "않다", "없다", "같다", "보다", "가다", "오다", "많다",  # 불용어
+        "또", "요", "오", "제", "내", "스", "그", "스원", "눈", "나", "것", "원님" # 추가 불필요 단어
+    ])
+
+    def extract_keywords(text: str) -> List[str]:
+        # 텍스트를 형태소 분석하고 명사와 형용사를 추출
+        morphs = okt.pos(text, stem=True)
+        keywords = [word for word, pos in morphs if pos in ['Noun', 'Adjective']]
+        return keywords
+    
+    all_keywords = []
+
+    # 각 댓글을 개별적으로 처리
+    for comment_dict in comments:
+        comment = comment_dict["content"]  # 딕셔너리에서 실제 댓글 내용 추출
+        keywords = extract_keywords(comment)
+        all_keywords.extend(keywords)
+
+    # 길이가 1 이하인 단어를 자동 불용어로 추가
+    auto_stopwords = set(word for word in all_keywords if len(word) <= 1)
+    all_stopwords = custom_stopwords.union(auto_stopwords)
+    
+    def filter_keywords(keywords: List[str], stopwords: set) -> List[str]:
+        # 불용어를 제외한 키워드 필터링
+        filtered_keywords = [word for word in keywords if word not in stopwords]
+        return filtered_keywords
+    
+    filtered_keywords = filter_keywords(all_keywords, all_stopwords)
+
+    # TF-IDF 벡터화
+    vectorizer = TfidfVectorizer()
+    comment_texts = [comment_dict["content"] for comment_dict in comments]  # TF-IDF 적용을 위한 댓글 리스트
+    X = vectorizer.fit_transform(comment_texts)
+
+    # TF-IDF 값이 높은 키워드 필터링
+    tfidf_scores = dict(zip(vectorizer.get_feature_names_out(), X.sum(axis=0).tolist()[0]))
+    tfidf_filtered_keywords = [word for word in filtered_keywords if tfidf_scores.get(word, 0) >= min_tfidf]
+        
+    def calculate_keyword_frequencies(keywords: List[str], min_frequency: int) -> dict:
+        # 최종적으로 필터링된 키워드의 빈도 계산
+        counter = Counter(keywords)
+        filtered_counter = {word: freq for word, freq in counter.items() if freq >= min_frequency}
+        return filtered_counter
+    
+    keyword_frequencies = calculate_keyword_frequencies(tfidf_filtered_keywords, min_frequency)
+    return keyword_frequencies
+
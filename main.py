@@ -1,11 +1,23 @@
+import asyncio
+import json
 import logging
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from async_processor import add_task, call_status, start_worker
-from tasks import crawling_artist, crawling_albums, crawling_songs, crawling_videos, crawling_photos,crawling_comments, bring_artist, bring_all_artists, bring_albums, bring_songs, bring_album_comments, bring_artist_comments, bring_latest_comments, process_keywords, bring_videos, bring_photos
+from fastapi.responses import StreamingResponse
+from async_processor import add_task, call_status, get_task_info, queue_stats, start_worker
+from tasks import crawling_artist, crawling_artist_all, crawling_albums, crawling_songs, crawling_videos, crawling_photos,crawling_comments, bring_artist, bring_all_artists, bring_albums, bring_songs, bring_album_comments, bring_artist_comments, bring_latest_comments, process_keywords, bring_videos, bring_photos
 from recommendation import predict_future_streams
+from refresh_scheduler import start_refresh_scheduler
+from process_pool import run_in_process, shutdown_process_pool, start_process_pool
+from crawling.melon.client import close_client, get_client
+from firebase.cache import load_cache_stats
+from firebase.client import get_db
+from firebase.load import load_page, projection, stream_documents
 from pydantic import BaseModel, FieldValidationInfo, field_validator
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set
 from datetime import datetime
 
 
@@ -15,7 +27,16 @@ from datetime import datetime
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_process_pool()
+    get_client()
+    get_db()
+    yield
+    await close_client()
+    shutdown_process_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,132 +46,311 @@ app.add_middleware(
     allow_headers=["*"],  # 모든 헤더 허용
 )
 
+# 연결별 전송 대기 메시지 수(작업 단위)와 전송 제한 시간(초)
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+
+# 메시지는 연결별 대기열에 넣기만 하고, 연결마다 전용 writer 태스크가 전송
+# 작업 실행 쪽은 웹소켓 I/O를 기다리지 않음
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        # 구독 주제('task:{task_id}', 'artist:{artist_id}')별 연결 목록
+        self.subscriptions: Dict[str, Set[WebSocket]] = {}
+        # 연결별 전송 대기 메시지 (같은 작업의 메시지는 최신 것 하나로 합침)
+        self.pending: Dict[WebSocket, OrderedDict] = {}
+        self.ready: Dict[WebSocket, asyncio.Event] = {}
+        self.writers: Dict[WebSocket, asyncio.Task] = {}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
+        self.pending[websocket] = OrderedDict()
+        self.ready[websocket] = asyncio.Event()
+        self.writers[websocket] = asyncio.create_task(self.writer(websocket))
 
     def disconnect(self, websocket: WebSocket):
+        if websocket not in self.pending:
+            return
         self.active_connections.remove(websocket)
-
-    async def send_message(self, websocket: WebSocket, message: Dict[str, str]):
-        await websocket.send_json(message)
-
-    async def broadcast(self, message: Dict[str, str]):
-        for connection in self.active_connections:
-            await connection.send_json(message)
+        del self.pending[websocket]
+        del self.ready[websocket]
+        writer = self.writers.pop(websocket)
+        if writer is not asyncio.current_task():
+            writer.cancel()
+        for topic in list(self.subscriptions):
+            self.unsubscribe(websocket, topic)
+
+    def subscribe(self, websocket: WebSocket, topic: str):
+        self.subscriptions.setdefault(topic, set()).add(websocket)
+
+    def unsubscribe(self, websocket: WebSocket, topic: str):
+        subscribers = self.subscriptions.get(topic)
+        if subscribers:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.subscriptions[topic]
+
+    async def writer(self, websocket: WebSocket):
+        pending = self.pending[websocket]
+        ready = self.ready[websocket]
+        try:
+            while True:
+                if not pending:
+                    ready.clear()
+                    await ready.wait()
+                    continue
+                _, message = pending.popitem(last=False)
+                await asyncio.wait_for(websocket.send_json(message), timeout=SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 끊어졌거나 응답하지 않는 연결은 정리
+            logger.warning(f"Dropping websocket connection: {e}")
+            self.disconnect(websocket)
+            try:
+                await websocket.close()
+            except Exception:
+                pass
+
+    # 같은 작업의 대기 중인 메시지는 최신 메시지로 교체하고, 대기 작업 수가 한도를 넘는 느린 연결은 끊음
+    def send_message(self, websocket: WebSocket, message: Dict[str, Any]):
+        pending = self.pending.get(websocket)
+        if pending is None:
+            return
+        key = message.get("task_id") or object()
+        pending.pop(key, None)
+        pending[key] = message
+
+        if len(pending) > SEND_QUEUE_SIZE:
+            logger.warning("Disconnecting slow websocket consumer")
+            self.disconnect(websocket)
+            asyncio.create_task(websocket.close())
+            return
+        self.ready[websocket].set()
+
+    def broadcast(self, message: Dict[str, Any]):
+        for connection in list(self.active_connections):
+            self.send_message(connection, message)
+
+    # 해당 작업 또는 아티스트를 구독한 연결에만 전송
+    def publish(self, message: Dict[str, Any]):
+        recipients = set()
+        for topic in (f"task:{message.get('task_id')}", f"artist:{message.get('artist_id')}"):
+            recipients |= self.subscriptions.get(topic, set())
+        for connection in recipients:
+            self.send_message(connection, message)
 
 manager = ConnectionManager()
 
+# 텍스트로 task_id를 보내면 현재 상태를 응답하고 해당 작업을 구독
+# JSON으로 {"action": "subscribe" | "unsubscribe", "task_ids": [...], "artist_ids": [...]}를 보내면 구독 목록 변경
 @app.websocket("/ws/task_status")
 async def websocket_endpoint(websocket : WebSocket):
     await manager.connect(websocket)
     try:
         while True:
-            task_id = await websocket.receive_text()
-            status = call_status(task_id)
-            await manager.send_message(websocket, {"task_id": task_id, "status": status})
+            text = await websocket.receive_text()
+            try:
+                request = json.loads(text)
+            except ValueError:
+                request = None
+
+            if isinstance(request, dict):
+                topics = [f"task:{task_id}" for task_id in request.get("task_ids", [])]
+                topics += [f"artist:{artist_id}" for artist_id in request.get("artist_ids", [])]
+                action = request.get("action", "subscribe")
+                for topic in topics:
+                    if action == "unsubscribe":
+                        manager.unsubscribe(websocket, topic)
+                    else:
+                        manager.subscribe(websocket, topic)
+                manager.send_message(websocket, {"action": action, "topics": topics})
+            else:
+                task_id = text
+                manager.subscribe(websocket, f"task:{task_id}")
+                status = await call_status(task_id)
+                manager.send_message(websocket, {"task_id": task_id, "status": status})
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
-start_worker()
+start_worker(manager)
+start_refresh_scheduler()
 
 @app.get("/task_status/{task_id}")
 async def check_task_status_endpoint(task_id: str):
-    status = call_status(task_id)
+    status = await call_status(task_id)
     if status == "not_found":
         raise HTTPException(status_code=404, detail="Task Not Founded")
-    return {"task_id": task_id, "status": status}
+    return {"task_id": task_id, "status": status, "details": get_task_info(task_id)}
+
+@app.get("/task_queue/stats")
+async def task_queue_stats_endpoint():
+    return {"status": "success", "data": queue_stats()}
 
 #=====================#
 
 @app.get("/crawling/melon/artist_info")
 async def crawling_artist_endpoint(url: str):
     task_id = f"crawling-artist-{url}"
-    add_task(task_id, crawling_artist, url)
-    return {"status": "task queued", "task_id" : task_id}
+    status = add_task(task_id, crawling_artist, url)
+    return {"status": f"task {status}", "task_id" : task_id}
 
 @app.get("/crawling/melon/{artist_id}/albums")
 async def crawling_albums_endpoint(artist_id: str):
     task_id = f"crawling-albums-{artist_id}"
-    add_task(task_id, crawling_albums, artist_id)
-    return {"status": "task queued", "task_id" : task_id}
+    status = add_task(task_id, crawling_albums, artist_id)
+    return {"status": f"task {status}", "task_id" : task_id}
 
 @app.get("/crawling/melon/{artist_id}/songs")
 async def crawling_songs_endpoint(artist_id: str):
     task_id = f"crawling-songs-{artist_id}"
-    add_task(task_id, crawling_songs, artist_id)
-    return {"status": "task queued", "task_id" : task_id}
+    status = add_task(task_id, crawling_songs, artist_id)
+    return {"status": f"task {status}", "task_id" : task_id}
 
 @app.get("/crawling/melon/{artist_id}/videos")
 async def crawling_videos_endpoint(artist_id: str):
     task_id = f"crawling-videos-{artist_id}"
-    add_task(task_id, crawling_videos, artist_id)
-    return {"status": "task queued", "task_id" : task_id}
+    status = add_task(task_id, crawling_videos, artist_id)
+    return {"status": f"task {status}", "task_id" : task_id}
 
 @app.get("/crawling/melon/{artist_id}/photos")
 async def crawling_photos_endpoint(artist_id: str):
     task_id = f"crawling-photos-{artist_id}"
-    add_task(task_id, crawling_photos, artist_id)
-    return {"status": "task queued", "task_id" : task_id}
+    status = add_task(task_id, crawling_photos, artist_id)
+    return {"status": f"task {status}", "task_id" : task_id}
 
 @app.get("/crawling/melon/{artist_id}/comments")
 async def crawling_comments_endpoint(artist_id: str):
     task_id = f"crawling-comments-{artist_id}"
-    add_task(task_id, crawling_comments, artist_id)
-    return {"status": "task queued", "task_id" : task_id}
+    status = add_task(task_id, crawling_comments, artist_id)
+    return {"status": f"task {status}", "task_id" : task_id}
+
+# 아티스트 정보/앨범/곡/비디오/포토/댓글을 한 번에 크롤링 (단계별 진행 상황은 /task_status에서 확인)
+@app.get("/crawling/melon/{artist_id}/all")
+async def crawling_artist_all_endpoint(artist_id: str):
+    task_id = f"crawling-all-{artist_id}"
+    status = add_task(task_id, crawling_artist_all, artist_id)
+    return {"status": f"task {status}", "task_id" : task_id}
+
+# 페이지 크기 상한과 limit 없이 start_after만 준 경우의 기본 페이지 크기
+MAX_PAGE_LIMIT = int(os.getenv("LOAD_MAX_PAGE_LIMIT", "1000"))
+DEFAULT_PAGE_LIMIT = int(os.getenv("LOAD_DEFAULT_PAGE_LIMIT", "100"))
+
+# fields=a,b,c 또는 view=slim(firebase.load.LOAD_VIEWS)으로 고른 필드만 Firestore에서 읽어 응답
+# 둘 다 없으면 None (문서 전체)
+def requested_fields(collection, fields, view):
+    try:
+        return projection(collection, fields, view)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+# 첫 문서는 응답을 시작하기 전에 받아 둔 것 (없으면 None)
+# 전송 중 Firestore 오류가 나면 {"error": ...} 줄을 마지막으로 보내 잘린 응답임을 알림
+async def ndjson_lines(first, documents):
+    try:
+        if first is not None:
+            yield json.dumps(first, default=json_default, ensure_ascii=False) + "\n"
+        async for document in documents:
+            yield json.dumps(document, default=json_default, ensure_ascii=False) + "\n"
+    except Exception as e:
+        logger.error(f"Document stream failed: {str(e)}")
+        yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+
+# 목록 조회 응답
+# stream=true면 Firestore 문서를 받는 대로 NDJSON 한 줄씩 전송 (요청당 메모리 사용량이 문서 수와 무관)
+# 첫 문서를 받기 전에 실패하면 503, 전송 중 실패하면 마지막 줄이 {"error": ...}
+# limit/start_after가 있으면 한 페이지와 다음 페이지의 start_after(next_start_after, 마지막이면 null)를 반환
+# 둘 다 없으면 bring()으로 전체 목록 반환 (기존 응답과 동일)
+# 페이지 조회 중 Firestore 오류는 503 (빈 마지막 페이지로 보이지 않도록)
+async def documents_response(bring, collection, field, value, limit, start_after, stream, fields, view, latest=False):
+    selected = requested_fields(collection, fields, view)
+    if stream:
+        documents = stream_documents(collection, field, value, latest, selected)
+        try:
+            first = await documents.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except Exception as e:
+            logger.error(f"Failed to stream {collection} from Firestore: {str(e)}")
+            raise HTTPException(status_code=503, detail=f"Failed to load {collection}")
+        return StreamingResponse(ndjson_lines(first, documents), media_type="application/x-ndjson")
+    if limit is None and start_after is None:
+        return {"status": "success", "data": await bring(value, selected)}
+    try:
+        data, next_start_after = await load_page(collection, field, value, limit or DEFAULT_PAGE_LIMIT, start_after, latest, selected)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to load {collection} page from Firestore: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Failed to load {collection}")
+    return {"status": "success", "data": data, "next_start_after": next_start_after}
 
 @app.get("/firebase/load/artist/{artist_id}")
-async def bring_artist_endpoint(artist_id: str):
-    artist_data = await bring_artist(artist_id)
+async def bring_artist_endpoint(artist_id: str, fields: Optional[str] = None, view: Optional[str] = None):
+    artist_data = await bring_artist(artist_id, requested_fields('artists', fields, view))
     return {"status": "success", "data": artist_data}
 
 @app.get("/firebase/load/{artist_id}/albums")
-async def bring_albums_endpoint(artist_id: str):
-    songs_data = await bring_albums(artist_id)
+async def bring_albums_endpoint(artist_id: str, fields: Optional[str] = None, view: Optional[str] = None):
+    songs_data = await bring_albums(artist_id, requested_fields('albums', fields, view))
     return {"status": "success", "data": songs_data}
 
 @app.get("/firebase/load/{artist_id}/songs")
-async def bring_songs_endpoint(artist_id: str):
-    songs_data = await bring_songs(artist_id)
-    return {"status": "success", "data": songs_data}
+async def bring_songs_endpoint(artist_id: str, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+                               start_after: Optional[str] = None, stream: bool = False,
+                               fields: Optional[str] = None, view: Optional[str] = None):
+    return await documents_response(bring_songs, 'songs', 'artist_id', artist_id, limit, start_after, stream, fields, view)
 
 @app.get("/firebase/load/{artist_id}/videos")
-async def bring_videos_endpoint(artist_id: str):
-    videos_data = await bring_videos(artist_id)
-    return {"status": "success", "data": videos_data}
+async def bring_videos_endpoint(artist_id: str, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+                                start_after: Optional[str] = None, stream: bool = False,
+                                fields: Optional[str] = None, view: Optional[str] = None):
+    return await documents_response(bring_videos, 'videos', 'artist_id', artist_id, limit, start_after, stream, fields, view)
 
 @app.get("/firebase/load/{artist_id}/photos")
-async def bring_photos_endpoint(artist_id: str):
-    photos_data = await bring_photos(artist_id)
-    return {"status": "success", "data": photos_data}
+async def bring_photos_endpoint(artist_id: str, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+                                start_after: Optional[str] = None, stream: bool = False,
+                                fields: Optional[str] = None, view: Optional[str] = None):
+    return await documents_response(bring_photos, 'photos', 'artist_id', artist_id, limit, start_after, stream, fields, view)
 
 @app.get("/firebase/load/{artist_id}/{album_id}/comments")
-async def bring_album_comments_endpoint(album_id: str):
-    comments_data = await bring_album_comments(album_id)
-    return {"status": "success", "data": comments_data}
+async def bring_album_comments_endpoint(album_id: str, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+                                        start_after: Optional[str] = None, stream: bool = False,
+                                        fields: Optional[str] = None, view: Optional[str] = None):
+    return await documents_response(bring_album_comments, 'comments', 'album_id', album_id, limit, start_after, stream, fields, view)
 
 @app.get("/firebase/load/{artist_id}/comments")
-async def bring_artist_comments_endpoint(artist_id: str):
-    comments_data = await bring_artist_comments(artist_id)
-    return {"status": "success", "data": comments_data}
+async def bring_artist_comments_endpoint(artist_id: str, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+                                         start_after: Optional[str] = None, stream: bool = False,
+                                         fields: Optional[str] = None, view: Optional[str] = None):
+    return await documents_response(bring_artist_comments, 'comments', 'artist_id', artist_id, limit, start_after, stream, fields, view)
 
+# limit/start_after가 없으면 최신 LATEST_COMMENTS_LIMIT개만 반환
 @app.get("/firebase/load/{artist_id}/comments/latest")
-async def bring_latest_comment_endpoint(artist_id: str):
-    comments = await bring_latest_comments(artist_id)
-    return {"status": "success", "data": comments}
+async def bring_latest_comment_endpoint(artist_id: str, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+                                        start_after: Optional[str] = None, stream: bool = False,
+                                        fields: Optional[str] = None, view: Optional[str] = None):
+    return await documents_response(bring_latest_comments, 'comments', 'artist_id', artist_id, limit, start_after, stream, fields, view, latest=True)
 
 @app.get('/firebase/load/artists')
-async def bring_all_artists_endpoint():
-    artists = await bring_all_artists()
+async def bring_all_artists_endpoint(fields: Optional[str] = None, view: Optional[str] = None):
+    artists = await bring_all_artists(requested_fields('artists', fields, view))
     return {"status": "success", "data": artists}
 
+# /firebase/load/* 조회 캐시의 적중률과 항목 수 (LOAD_CACHE_TTL/LOAD_CACHE_MAX_ENTRIES/LOAD_CACHE_MAX_BYTES 조정용)
+@app.get('/firebase/cache/stats')
+async def load_cache_stats_endpoint():
+    return {"status": "success", "data": load_cache_stats()}
+
 @app.post('/process/keywords/frequency')
 async def process_keywords_frequency_endpoint(comments: Dict[str, Any]):
-    frequencies = process_keywords(comments["data"])
+    frequencies = await run_in_process(process_keywords, comments["data"], pool="keywords")
     return {"status": "success", "data": frequencies}
 
 class Metrics(BaseModel):
@@ -0,0 +1,94 @@
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# CPU 작업용 프로세스 수 (0이면 이벤트 루프에서 바로 실행)
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+# 워커 시작 시 미리 불러올 모듈 (warm_up()이 있으면 함께 호출)
+CPU_POOL_PRELOAD = [module for module in os.getenv("CPU_POOL_PRELOAD", "crawling.melon.parsers").split(",") if module]
+
+# 키워드 추출(konlpy/JVM)과 예측 모델 학습(TensorFlow)은 메모리를 많이 쓰므로 작은 전용 풀에서만 실행
+KEYWORDS_POOL_WORKERS = int(os.getenv("KEYWORDS_POOL_WORKERS", "1"))
+TRAINING_POOL_WORKERS = int(os.getenv("TRAINING_POOL_WORKERS", "1"))
+
+# 작업 종류별 풀: 이름 -> (프로세스 수, 미리 불러올 모듈)
+POOLS = {
+    "cpu": (CPU_POOL_WORKERS, CPU_POOL_PRELOAD),
+    "keywords": (KEYWORDS_POOL_WORKERS, ["keywords"]),
+    "training": (TRAINING_POOL_WORKERS, ["recommendation"]),
+}
+
+_pools = {}
+
+# 무거운 import(konlpy/JVM, TensorFlow)를 워커당 한 번만 수행
+def _warm_worker(preload):
+    for module_name in preload:
+        try:
+            module = importlib.import_module(module_name)
+            if hasattr(module, "warm_up"):
+                module.warm_up()
+        except Exception as e:
+            logger.error(f"Failed to preload {module_name} in worker: {e}")
+
+def _ping():
+    return os.getpid()
+
+def get_process_pool(name="cpu"):
+    pool = _pools.get(name)
+    if pool is None:
+        workers, preload = POOLS[name]
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker,
+            initargs=(preload,),
+        )
+        _pools[name] = pool
+    return pool
+
+# 워커가 비정상 종료(OOM 등)되어 깨진 풀을 버리고, 다음 요청에서 새로 만들도록 함
+def _discard_broken_pool(name, pool):
+    if _pools.get(name) is pool:
+        del _pools[name]
+        logger.error(f"Process pool '{name}' is broken, recreating it")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# 모든 워커를 미리 띄워 첫 요청이 import 비용을 기다리지 않도록 함 (names가 없으면 모든 풀)
+def start_process_pool(names=None):
+    for name in names or POOLS:
+        workers = POOLS[name][0]
+        if workers <= 0:
+            continue
+        pool = get_process_pool(name)
+        for _ in range(workers):
+            pool.submit(_ping)
+
+def shutdown_process_pool():
+    for pool in _pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    _pools.clear()
+
+# CPU 작업을 pool 이름의 프로세스 풀에서 실행 (함수와 인자는 pickle 가능해야 함)
+# 풀이 깨져 있으면 새 풀에서 한 번 더 시도 (다른 작업 때문에 함께 실패한 경우)
+async def run_in_process(func, *args, pool="cpu", **kwargs):
+    if POOLS[pool][0] <= 0:
+        return func(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    call = partial(func, *args, **kwargs)
+    for attempt in range(2):
+        executor = get_process_pool(pool)
+        try:
+            return await loop.run_in_executor(executor, call)
+        except BrokenProcessPool:
+            _discard_broken_pool(pool, executor)
+            if attempt:
+                raise
@@ -4,8 +4,7 @@ import numpy as np
 import logging
 import asyncio
 from typing import List
-import tensorflow as tf
-from keras import layers, models
+from process_pool import run_in_process
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -27,7 +26,13 @@ class TrainingData(BaseModel):
     targetMetrics: Metrics
     compareMetrics: List[Metrics]
 
+# TensorFlow는 프로세스 풀 워커에서만 불러옴
+def warm_up():
+    import tensorflow
+    from keras import layers, models
+
 def build_mlp_model(input_shape):
+    from keras import layers, models
     model = models.Sequential()
     model.add(layers.Input(shape=(input_shape,)))
     model.add(layers.Dense(128, activation='relu'))
@@ -42,6 +47,11 @@ def train_mlp_model(X_train, y_train, epochs=100, batch_size=32):
     model.fit(X_train, y_train, epochs=epochs, batch_size=batch_size, validation_split=0.2, verbose=0)
     return model
 
+# 학습과 예측을 같은 워커 프로세스에서 수행 (모델 대신 예측값만 반환)
+def train_and_predict(X_train, y_train, X_targets):
+    model = train_mlp_model(X_train, y_train)
+    return model.predict(X_targets, verbose=0)[:, 0].tolist()
+
 async def calculate_improvement_effects(target: Metrics, medians: dict):
     improvements = {}
 
@@ -82,13 +92,11 @@ async def predict_future_streams(training_data: TrainingData) -> dict:
 
         X_train = np.array([[m.followers, m.songsReleased, m.albumsReleased, m.releaseFrequency, m.totalLikes, m.totalStreams, m.totalComments, m.totalVideos, m.totalPhotos] for m in training_data.compareMetrics])
         y_train = np.array([m.totalStreams for m in training_data.compareMetrics])
-        model = await asyncio.to_thread(train_mlp_model, X_train, y_train)
+        X_targets = np.array([[improved_target.followers, improved_target.songsReleased, improved_target.albumsReleased, improved_target.releaseFrequency, improved_target.totalLikes, improved_target.totalStreams, improved_target.totalComments, improved_target.totalVideos, improved_target.totalPhotos] for improved_target in improvements.values()])
+        prediction_values = await run_in_process(train_and_predict, X_train, y_train, X_targets, pool="training")
 
         predictions = {}
-        for metric, improved_target in improvements.items():
-            target_data = np.array([[improved_target.followers, improved_target.songsReleased, improved_target.albumsReleased, improved_target.releaseFrequency, improved_target.totalLikes, improved_target.totalStreams, improved_target.totalComments, improved_target.totalVideos, improved_target.totalPhotos]])
-            prediction = await asyncio.to_thread(model.predict, target_data)
-            prediction_value = float(prediction[0][0])
+        for (metric, improved_target), prediction_value in zip(improvements.items(), prediction_values):
             if prediction_value < improved_target.totalStreams:
                 prediction_value = improved_target.totalStreams
 
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from async_processor import JOURNAL_RETENTION, add_task, get_completed_times
+from crawling.melon.artist_info import artist_url
+from tasks import crawling_artist, crawling_albums, crawling_songs, crawling_videos, crawling_photos, crawling_comments, bring_all_artists
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REFRESH_SCHEDULER_ENABLED = os.getenv("REFRESH_SCHEDULER_ENABLED", "0") == "1"
+
+# 전체 아티스트 목록을 다시 훑는 주기(초)
+REFRESH_SWEEP_INTERVAL = float(os.getenv("REFRESH_SWEEP_INTERVAL", "600"))
+
+# 분당 큐에 넣을 수 있는 갱신 작업 수 (전체 갱신에 걸리는 시간 = 갱신할 작업 수 / 예산)
+REFRESH_BUDGET_PER_MINUTE = float(os.getenv("REFRESH_BUDGET_PER_MINUTE", "60"))
+
+# 항목별 갱신 주기(초), REFRESH_INTERVAL_<항목> 환경 변수로 변경 가능
+DEFAULT_REFRESH_INTERVALS = {
+    "artist": 86400,
+    "albums": 86400,
+    "songs": 3600,
+    "videos": 86400,
+    "photos": 604800,
+    "comments": 3600,
+}
+REFRESH_INTERVALS = {
+    facet: float(os.getenv(f"REFRESH_INTERVAL_{facet.upper()}", str(interval)))
+    for facet, interval in DEFAULT_REFRESH_INTERVALS.items()
+}
+
+# 항목별 (task_id, 작업 함수, 작업 인자) 생성 함수 (엔드포인트와 같은 task_id를 사용해 중복 작업이 합쳐짐)
+def artist_refresh_task(artist_id):
+    url = artist_url(artist_id)
+    return f"crawling-artist-{url}", crawling_artist, url
+
+REFRESH_TASKS = {
+    "artist": artist_refresh_task,
+    "albums": lambda artist_id: (f"crawling-albums-{artist_id}", crawling_albums, artist_id),
+    "songs": lambda artist_id: (f"crawling-songs-{artist_id}", crawling_songs, artist_id),
+    "videos": lambda artist_id: (f"crawling-videos-{artist_id}", crawling_videos, artist_id),
+    "photos": lambda artist_id: (f"crawling-photos-{artist_id}", crawling_photos, artist_id),
+    "comments": lambda artist_id: (f"crawling-comments-{artist_id}", crawling_comments, artist_id),
+}
+
+def to_timestamp(value):
+    if value is None:
+        return None
+    if hasattr(value, "timestamp"):
+        return value.timestamp()
+    return float(value)
+
+# 마지막 갱신 시각: 완료된 크롤링 작업 기록, 아티스트 정보는 Firestore의 updatedAt도 함께 고려
+def last_refreshed_at(artist, facet, completed_at):
+    refreshed_at = completed_at
+    if facet == "artist":
+        updated_at = to_timestamp(artist.get("updatedAt"))
+        if updated_at and (refreshed_at is None or updated_at > refreshed_at):
+            refreshed_at = updated_at
+    return refreshed_at
+
+# 갱신 대상 (아티스트, 항목, 갱신 주기, 작업) 목록
+def refresh_candidates(artists):
+    candidates = []
+    for artist in artists:
+        artist_id = artist.get("id")
+        if not artist_id:
+            continue
+        for facet, interval in REFRESH_INTERVALS.items():
+            if interval <= 0:
+                continue
+            candidates.append((artist, facet, interval, REFRESH_TASKS[facet](artist_id)))
+    return candidates
+
+# 갱신 주기가 지난 (아티스트, 항목) 작업을 오래된 순으로 반환
+# completed: {task_id: 마지막 완료 시각} (get_completed_times로 한 번에 조회한 값)
+def find_due_refreshes(candidates, completed, now):
+    due = []
+    for artist, facet, interval, task in candidates:
+        refreshed_at = last_refreshed_at(artist, facet, completed.get(task[0]))
+        if refreshed_at is None or now - refreshed_at >= interval:
+            due.append((refreshed_at or 0, task))
+    due.sort(key=lambda item: item[0])
+    return [task for _, task in due]
+
+async def run_sweep():
+    artists = await bring_all_artists()
+    if not artists:
+        return 0
+
+    candidates = refresh_candidates(artists)
+    completed = await get_completed_times([task[0] for _, _, _, task in candidates])
+    due = find_due_refreshes(candidates, completed, time.time())
+    if not due:
+        return 0
+
+    # 예산에 맞춰 작업 사이 간격을 두어 부하를 분산
+    spacing = 60 / REFRESH_BUDGET_PER_MINUTE
+    expected = len(due) * spacing
+    logger.info(f"Refreshing {len(due)} tasks for {len(artists)} artists, expected to take up to {expected / 60:.1f} minutes")
+
+    # 갱신할 작업을 예산 안에 다 넣는 시간이 가장 짧은 갱신 주기보다 길면 그 항목은 주기를 지킬 수 없음
+    shortest = min(interval for interval in REFRESH_INTERVALS.values() if interval > 0)
+    if expected > shortest:
+        logger.warning(f"{len(due)} due refreshes need {expected:.0f}s at REFRESH_BUDGET_PER_MINUTE={REFRESH_BUDGET_PER_MINUTE:g}, "
+                       f"longer than the shortest refresh interval ({shortest:.0f}s)")
+
+    # 이미 대기/실행 중인 작업에 합쳐진 경우에는 예산을 쓰지 않으므로 기다리지 않음
+    queued = 0
+    for task_id, task_func, task_arg in due:
+        if add_task(task_id, task_func, task_arg) == "queued":
+            queued += 1
+            await asyncio.sleep(spacing * random.uniform(0.8, 1.2))
+
+    logger.info(f"Refresh sweep queued {queued} tasks ({len(due) - queued} already pending)")
+    return queued
+
+async def refresh_loop():
+    while True:
+        started = time.monotonic()
+        try:
+            await run_sweep()
+        except Exception as e:
+            logger.error(f"Refresh sweep failed: {str(e)}")
+        await asyncio.sleep(max(0, REFRESH_SWEEP_INTERVAL - (time.monotonic() - started)))
+
+def start_refresh_scheduler():
+    if not REFRESH_SCHEDULER_ENABLED:
+        return None
+    # 저널 기록이 갱신 주기보다 먼저 지워지면 재시작할 때마다 해당 항목을 전부 다시 크롤링함
+    longest = max(REFRESH_INTERVALS.values())
+    if longest > JOURNAL_RETENTION:
+        logger.warning(f"TASK_JOURNAL_RETENTION ({JOURNAL_RETENTION:.0f}s) is shorter than the longest refresh interval ({longest:.0f}s)")
+    loop = asyncio.get_event_loop()
+    return loop.create_task(refresh_loop())
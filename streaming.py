@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import os
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 한 번에 저장할 레코드 수 (Firestore batch 한도 500개 이하)와 크롤러-저장 사이 대기열 크기
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "400"))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "2000"))
+
+_DONE = object()
+
+# 크롤러(async generator)가 내보내는 레코드를 bounded queue로 받아 batch_size개씩 저장
+# 저장하는 동안에도 수집은 계속되고, 대기열이 차면 크롤러가 기다림 (메모리 사용량 제한)
+# 크롤링 중 오류가 나도 그 전까지 받은 레코드는 저장한 뒤 오류를 다시 발생시킴
+# save는 레코드 목록을 받아 성공 여부를 반환하는 코루틴 함수 (save_* 함수들), (저장 수, 실패 수) 반환
+# 취소되면 크롤러를 aclose()로 닫고, 받는 쪽이 없으므로 완료 신호는 넣지 않음 (대기열이 차 있으면 영원히 기다리게 됨)
+async def stream_to_store(records, save, batch_size=STREAM_BATCH_SIZE, queue_size=STREAM_QUEUE_SIZE):
+    queue = asyncio.Queue(maxsize=queue_size)
+
+    async def produce():
+        try:
+            async for record in records:
+                await queue.put(record)
+        except Exception:
+            await queue.put(_DONE)
+            raise
+        else:
+            await queue.put(_DONE)
+        finally:
+            if hasattr(records, "aclose"):
+                await records.aclose()
+
+    saved, failed = 0, 0
+
+    async def flush(batch):
+        nonlocal saved, failed
+        if await save(batch):
+            saved += len(batch)
+        else:
+            failed += len(batch)
+            logger.error(f"Failed to save batch of {len(batch)} records")
+
+    producer = asyncio.create_task(produce())
+    try:
+        batch = []
+        while True:
+            record = await queue.get()
+            if record is _DONE:
+                break
+            batch.append(record)
+            if len(batch) >= batch_size:
+                await flush(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+        await producer
+    finally:
+        if not producer.done():
+            producer.cancel()
+            await asyncio.wait([producer])
+
+    return saved, failed
@@ -0,0 +1,47 @@
+import os
+import time
+from contextvars import ContextVar
+
+# 크롤러 모듈이 작업 실행기(async_processor)를 import하지 않고도 진행률을 보고할 수 있도록 분리한 작업 컨텍스트
+# (async_processor를 import하면 작업 큐와 저널까지 불러오게 됨)
+
+# 같은 단계의 진행률 이벤트를 보내는 최소 간격(초)
+PROGRESS_INTERVAL = float(os.getenv("TASK_PROGRESS_INTERVAL", "0.5"))
+
+# 현재 실행 중인 작업 정보 (작업 밖에서는 None)
+_task_context = ContextVar("task_context", default=None)
+
+def get_task_context():
+    return _task_context.get()
+
+# 작업을 시작할 때 작업 실행기가 설정
+# on_progress(progress, publish)는 진행률 저장/전송, on_result(detail)는 결과 요약 저장을 맡는 콜백
+def set_task_context(task_id, artist_id, on_progress=None, on_result=None):
+    _task_context.set({
+        "task_id": task_id,
+        "artist_id": artist_id,
+        "progress_sent": {},
+        "on_progress": on_progress,
+        "on_result": on_result,
+    })
+
+# 실행 중인 작업의 단계별 진행률 보고 (구독자 전송은 PROGRESS_INTERVAL 간격으로 제한, 마지막 단계는 항상 전송)
+def report_progress(stage, done, total, **detail):
+    context = get_task_context()
+    if context is None or context["on_progress"] is None:
+        return
+
+    progress = {"stage": stage, "done": done, "total": total, **detail}
+    now = time.monotonic()
+    last_sent = context["progress_sent"].get(stage, 0)
+    publish = done >= total or now - last_sent >= PROGRESS_INTERVAL
+    if publish:
+        context["progress_sent"][stage] = now
+    context["on_progress"](progress, publish)
+
+# 실행 중인 작업의 결과 요약(누락된 통계 수 등) 보고
+def report_result(**detail):
+    context = get_task_context()
+    if context is None or context["on_result"] is None:
+        return
+    context["on_result"](detail)
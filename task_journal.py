@@ -0,0 +1,213 @@
+import asyncio
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TASK_JOURNAL = os.getenv("TASK_JOURNAL", "sqlite")
+TASK_JOURNAL_PATH = os.getenv("TASK_JOURNAL_PATH", "task_journal.db")
+JOURNAL_FLUSH_INTERVAL = float(os.getenv("TASK_JOURNAL_FLUSH_INTERVAL", "0.2"))
+JOURNAL_BATCH_SIZE = int(os.getenv("TASK_JOURNAL_BATCH_SIZE", "500"))
+
+UNFINISHED_STATUSES = ("queued", "in_progress")
+
+# 함수 객체 <-> 'module:qualname' 문자열 변환 (재시작 후 재실행용)
+def func_to_name(func):
+    return f"{func.__module__}:{func.__qualname__}"
+
+def name_to_func(name):
+    module_name, qualname = name.split(":", 1)
+    obj = importlib.import_module(module_name)
+    for attr in qualname.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+# 저널 인터페이스 (기본 구현은 아무것도 기록하지 않음)
+class TaskJournal:
+    def record_enqueue(self, task_id, task_func, task_args):
+        pass
+
+    def record_start(self, task_id):
+        pass
+
+    def record_finish(self, task_id, status, error=None):
+        pass
+
+    def get_status(self, task_id):
+        return None
+
+    def get_finished_at(self, task_id):
+        return None
+
+    def get_finished_at_many(self, task_ids):
+        return {}
+
+    def load_unfinished(self):
+        return []
+
+    async def run(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def purge(self, older_than):
+        pass
+
+NullTaskJournal = TaskJournal
+
+# SQLite 저널: 이벤트를 메모리에 모았다가 백그라운드에서 일괄 기록
+class SQLiteTaskJournal(TaskJournal):
+    def __init__(self, path=TASK_JOURNAL_PATH, flush_interval=JOURNAL_FLUSH_INTERVAL, batch_size=JOURNAL_BATCH_SIZE):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.pending = {}
+        self.writing = {}
+        self.wakeup = None
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                func TEXT,
+                args TEXT,
+                status TEXT,
+                enqueued_at REAL,
+                started_at REAL,
+                finished_at REAL,
+                error TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def _update(self, task_id, **fields):
+        event = self.pending.setdefault(task_id, {})
+        event.update(fields)
+        if self.wakeup is not None and len(self.pending) >= self.batch_size:
+            self.wakeup.set()
+
+    def record_enqueue(self, task_id, task_func, task_args):
+        try:
+            args = json.dumps(list(task_args))
+        except TypeError:
+            logger.warning(f"Task {task_id} has non-serializable arguments and will not be replayed")
+            args = None
+        self._update(task_id, func=func_to_name(task_func), args=args, status="queued",
+                     enqueued_at=time.time(), started_at=None, finished_at=None, error=None)
+
+    def record_start(self, task_id):
+        self._update(task_id, status="in_progress", started_at=time.time())
+
+    def record_finish(self, task_id, status, error=None):
+        self._update(task_id, status=status, finished_at=time.time(), error=error)
+
+    def get_status(self, task_id):
+        for events in (self.pending, self.writing):
+            event = events.get(task_id)
+            if event and "status" in event:
+                return event["status"]
+        with self.lock:
+            row = self.conn.execute("SELECT status FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return row[0] if row else None
+
+    # 마지막으로 완료된 시각 (완료되지 않았으면 None)
+    def get_finished_at(self, task_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT finished_at FROM tasks WHERE task_id = ? AND status = 'completed'", (task_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    # 여러 작업의 마지막 완료 시각을 한 번에 조회 ({task_id: finished_at}, 완료되지 않은 작업은 없음)
+    # SQLite 변수 개수 제한 때문에 500개씩 나눠 조회, 이벤트 루프를 막지 않도록 asyncio.to_thread로 호출
+    def get_finished_at_many(self, task_ids):
+        task_ids = list(task_ids)
+        finished = {}
+        with self.lock:
+            for start in range(0, len(task_ids), 500):
+                chunk = task_ids[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT task_id, finished_at FROM tasks WHERE status = 'completed' "
+                    f"AND task_id IN ({', '.join('?' for _ in chunk)})",
+                    chunk,
+                ).fetchall()
+                finished.update(rows)
+        return finished
+
+    def load_unfinished(self):
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT task_id, func, args FROM tasks WHERE status IN (?, ?) ORDER BY enqueued_at",
+                UNFINISHED_STATUSES,
+            ).fetchall()
+
+        tasks = []
+        for task_id, func_name, args in rows:
+            try:
+                tasks.append((task_id, name_to_func(func_name), json.loads(args)))
+            except Exception as e:
+                logger.error(f"Cannot replay task {task_id} ({func_name}): {e}")
+                self.record_finish(task_id, "failed", error=f"Replay failed: {e}")
+        return tasks
+
+    # 종료된 지 오래된 작업 기록 삭제
+    def purge(self, older_than):
+        with self.lock:
+            self.conn.execute(
+                "DELETE FROM tasks WHERE status NOT IN (?, ?) AND finished_at < ?",
+                (*UNFINISHED_STATUSES, time.time() - older_than),
+            )
+            self.conn.commit()
+
+    def flush(self):
+        events, self.pending = self.pending, {}
+        self._write(events)
+
+    def _write(self, events):
+        if not events:
+            return
+        with self.lock:
+            for task_id, fields in events.items():
+                columns = ", ".join(fields)
+                placeholders = ", ".join("?" for _ in fields)
+                updates = ", ".join(f"{column} = excluded.{column}" for column in fields)
+                self.conn.execute(
+                    f"INSERT INTO tasks (task_id, {columns}) VALUES (?, {placeholders}) "
+                    f"ON CONFLICT(task_id) DO UPDATE SET {updates}",
+                    (task_id, *fields.values()),
+                )
+            self.conn.commit()
+
+    async def run(self):
+        self.wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+
+            if self.pending:
+                # 기록하는 동안 새 이벤트는 self.pending에 쌓임
+                self.writing, self.pending = self.pending, {}
+                try:
+                    await asyncio.to_thread(self._write, self.writing)
+                except Exception as e:
+                    logger.error(f"Failed to flush task journal: {e}")
+                    for task_id, fields in self.writing.items():
+                        self.pending[task_id] = {**fields, **self.pending.get(task_id, {})}
+                finally:
+                    self.writing = {}
+
+def create_journal():
+    if TASK_JOURNAL == "sqlite":
+        return SQLiteTaskJournal()
+    return NullTaskJournal()
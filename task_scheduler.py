@@ -0,0 +1,158 @@
+import asyncio
+import time
+from collections import Counter, OrderedDict, deque
+from urllib.parse import parse_qs, urlparse
+
+# 우선순위 클래스 (앞쪽이 먼저 실행됨)
+PRIORITY_ORDER = ["interactive", "standard", "bulk"]
+DEFAULT_PRIORITY = "standard"
+
+# 작업 유형별 우선순위 클래스
+TASK_PRIORITIES = {
+    "crawling-artist": "interactive",
+    "crawling-albums": "standard",
+    "crawling-songs": "standard",
+    "crawling-videos": "standard",
+    "crawling-photos": "standard",
+    "crawling-comments": "bulk",
+    "crawling-all": "bulk",
+}
+
+# task_id에서 작업 유형 추출 ('crawling-songs-123' -> 'crawling-songs')
+def get_task_type(task_id):
+    return "-".join(task_id.split("-")[:2])
+
+# task_id에서 아티스트 ID 추출 ('crawling-songs-123' -> '123', 'crawling-artist-{url}' -> url의 artistId)
+def get_artist_id(task_id):
+    key = task_id[len(get_task_type(task_id)) + 1:]
+    if "artistId=" in key:
+        return parse_qs(urlparse(key).query).get("artistId", [key])[0]
+    return key
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+# 우선순위 클래스 + 아티스트별 라운드로빈 스케줄러
+# 대기 작업을 (클래스, 작업 유형)별로 나누고 그 안에서 아티스트마다 큐를 두어 돌아가며 꺼냄
+# 동시 실행 제한에 걸린 유형은 대기 작업을 보지 않고 건너뛰므로 한 번 꺼내는 비용은 유형 수에 비례
+# 작업이 추가/완료될 때는 기다리는 워커 하나만 깨움
+class TaskScheduler:
+    def __init__(self, type_limits, default_limit):
+        self.type_limits = type_limits
+        self.default_limit = default_limit
+        # 우선순위 -> 작업 유형 -> 아티스트 -> 대기 작업
+        self.classes = {priority: OrderedDict() for priority in PRIORITY_ORDER}
+        self.queued = Counter()
+        self.running = Counter()
+        self.wait_times = {priority: deque(maxlen=10000) for priority in PRIORITY_ORDER}
+        self.waiters = deque()
+        self.all_done = asyncio.Event()
+        self.all_done.set()
+        self.unfinished = 0
+
+    def _priority(self, task_type):
+        priority = TASK_PRIORITIES.get(task_type, DEFAULT_PRIORITY)
+        return priority if priority in self.classes else DEFAULT_PRIORITY
+
+    def _limit(self, task_type):
+        return self.type_limits.get(task_type, self.default_limit)
+
+    def put(self, entry):
+        task_id = entry[0]
+        task_type = get_task_type(task_id)
+        priority = self._priority(task_type)
+        artists = self.classes[priority].setdefault(task_type, OrderedDict())
+        artists.setdefault(get_artist_id(task_id), deque()).append(entry)
+        self.queued[priority] += 1
+
+        self.unfinished += 1
+        self.all_done.clear()
+        if self.running[task_type] < self._limit(task_type):
+            self._wake_one()
+
+    def _has_eligible(self):
+        return any(self.running[task_type] < self._limit(task_type)
+                   for types in self.classes.values() for task_type in types)
+
+    def _pop_eligible(self):
+        for priority in PRIORITY_ORDER:
+            types = self.classes[priority]
+            for task_type, artists in types.items():
+                if self.running[task_type] >= self._limit(task_type):
+                    continue
+                artist_key, entries = next(iter(artists.items()))
+                entry = entries.popleft()
+                # 꺼낸 아티스트와 유형은 맨 뒤로 보내 다른 아티스트/유형에게 차례를 넘김 (바로 반환하므로 순회 중 변경해도 안전)
+                if entries:
+                    artists.move_to_end(artist_key)
+                else:
+                    del artists[artist_key]
+                if artists:
+                    types.move_to_end(task_type)
+                else:
+                    del types[task_type]
+                self.queued[priority] -= 1
+                self.running[task_type] += 1
+                self.wait_times[priority].append(time.monotonic() - entry[3])
+                return entry
+        return None
+
+    def _wake_one(self):
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    async def get(self):
+        while True:
+            entry = self._pop_eligible()
+            if entry is not None:
+                # 꺼낼 수 있는 작업이 더 남아 있으면 다음 워커를 깨움
+                if self.waiters and self._has_eligible():
+                    self._wake_one()
+                return entry
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # 깨운 직후 취소되면 다른 워커가 대신 꺼내도록 넘김
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_one()
+                raise
+            finally:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+
+    def task_done(self, task_id):
+        task_type = get_task_type(task_id)
+        self.running[task_type] -= 1
+        self.unfinished -= 1
+        if self.unfinished == 0:
+            self.all_done.set()
+        if task_type in self.classes[self._priority(task_type)]:
+            self._wake_one()
+
+    async def join(self):
+        await self.all_done.wait()
+
+    def qsize(self):
+        return sum(self.queued.values())
+
+    def stats(self):
+        stats = {}
+        for priority in PRIORITY_ORDER:
+            waits = list(self.wait_times[priority])
+            stats[priority] = {
+                "queued": self.queued[priority],
+                "artists": len({artist_key for artists in self.classes[priority].values() for artist_key in artists}),
+                "wait_p50": percentile(waits, 50),
+                "wait_p95": percentile(waits, 95),
+                "wait_p99": percentile(waits, 99),
+            }
+        return stats
@@ -0,0 +1,78 @@
+import os
+import time
+from collections import OrderedDict
+
+# 보관할 최대 작업 수와 완료/실패 작업의 보관 시간(초)
+TASK_STATUS_MAX_SIZE = int(os.getenv("TASK_STATUS_MAX_SIZE", "10000"))
+TASK_STATUS_RETENTION = float(os.getenv("TASK_STATUS_RETENTION", "86400"))
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+# LRU + TTL 작업 상태 저장소
+# 대기/실행 중인 작업은 제거하지 않고, 완료/실패 작업만 오래된 순서로 제거
+class TaskStatusStore:
+    def __init__(self, max_size=TASK_STATUS_MAX_SIZE, retention=TASK_STATUS_RETENTION):
+        self.max_size = max_size
+        self.retention = retention
+        self.records = OrderedDict()
+
+    def _expired(self, record, now):
+        return record["status"] in TERMINAL_STATUSES and now - record["finished_at"] > self.retention
+
+    def get(self, task_id):
+        record = self.records.get(task_id)
+        if record is None:
+            return None
+        if self._expired(record, time.time()):
+            del self.records[task_id]
+            return None
+        self.records.move_to_end(task_id)
+        return record
+
+    def get_status(self, task_id):
+        record = self.get(task_id)
+        return record["status"] if record else None
+
+    def set_status(self, task_id, status, error=None):
+        now = time.time()
+        record = self.records.get(task_id)
+        if record is None or status == "queued":
+            record = {"status": status, "queued_at": now, "started_at": None, "finished_at": None, "error": None}
+            self.records[task_id] = record
+
+        record["status"] = status
+        if status == "in_progress":
+            record["started_at"] = now
+        elif status in TERMINAL_STATUSES:
+            record["finished_at"] = now
+            record["error"] = error
+        self.records.move_to_end(task_id)
+
+        if len(self.records) > self.max_size:
+            self.prune()
+        return record
+
+    # 상태 외 부가 정보(진행률 등) 갱신
+    def update(self, task_id, **fields):
+        record = self.records.get(task_id)
+        if record is not None:
+            record.update(fields)
+        return record
+
+    def prune(self):
+        now = time.time()
+        for task_id in [task_id for task_id, record in self.records.items() if self._expired(record, now)]:
+            del self.records[task_id]
+
+        # 크기 초과 시 가장 오래 조회되지 않은 완료/실패 작업부터 제거 (매번 정리하지 않도록 10% 여유)
+        overflow = len(self.records) - int(self.max_size * 0.9)
+        if overflow > 0:
+            evictable = [task_id for task_id, record in self.records.items() if record["status"] in TERMINAL_STATUSES]
+            for task_id in evictable[:overflow]:
+                del self.records[task_id]
+
+    def __contains__(self, task_id):
+        return self.get(task_id) is not None
+
+    def __len__(self):
+        return len(self.records)
@@ -1,17 +1,25 @@
 import logging
-from crawling.melon.artist_info import get_artist_info
+from crawling.melon.artist_info import artist_url, get_artist_info
 from crawling.melon.albums import get_albums
-from crawling.melon.songs import get_songs
-from crawling.melon.comments import get_comments
-from crawling.melon.videos import get_videos
-from crawling.melon.photos import get_photos
-from firebase.save import save_artist, save_albums, save_songs, save_comments, save_videos, save_photos
-from firebase.load import load_artist, load_all_artists, load_artist_songs, load_artist_albums, load_artist_comments, load_latest_comments, load_album_comments, load_artist_videos, load_artist_photos
+from crawling.melon.songs import iter_songs
+from crawling.melon.comments import iter_comments
+from crawling.melon.videos import iter_videos
+from crawling.melon.photos import iter_photos
+from firebase.save import save_artist, save_albums, save_songs, save_comments, save_comment_watermark, save_videos, save_photos
+from firebase.load import load_artist, load_all_artists, load_artist_songs, load_artist_albums, load_artist_comments, load_latest_comments, load_album_comments, load_artist_videos, load_artist_photos, load_comment_watermarks
 import asyncio
+import os
+import time
+from task_context import report_progress
+from streaming import stream_to_store
+from keywords import process_keywords
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 댓글을 동시에 수집/저장하는 앨범 수 (버퍼에 쌓이는 댓글과 동시 Firestore 쓰기가 앨범 수와 무관하도록 제한)
+COMMENT_ALBUM_CONCURRENCY = int(os.getenv("COMMENT_ALBUM_CONCURRENCY", "4"))
+
 async def crawling_artist(url: str):
     try:
         artist_info = await get_artist_info(url)
@@ -26,6 +34,16 @@ async def crawling_artist(url: str):
     except Exception as e:
         logger.error(f"Exception : {str(e)}")
 
+# 첫 앨범 발매일이 기존 데뷔일보다 빠르면 데뷔일을 갱신 (변경 여부 반환)
+def update_debut_date(artist: dict, albums: list) -> bool:
+    debut_date = artist.get('debut_date', '')
+    first_album_released = min(album['release_date'] for album in albums)
+    logger.info(f"Artist Debut Date {debut_date}, First Album Released {first_album_released}")
+    if not debut_date or debut_date > first_album_released:
+        artist['debut_date'] = first_album_released
+        return True
+    return False
+
 async def crawling_albums(artist_id: str):
     try:
         albums = await get_albums(artist_id)
@@ -34,19 +52,15 @@ async def crawling_albums(artist_id: str):
             if success:
                 logger.info(f"{len(albums)} Albums Saved!")
 
+                # load_artist는 캐시에 보관된 dict를 돌려주므로 복사본을 수정
                 artist = await load_artist(artist_id)
-                if artist:
-                    debut_date = artist.get('debut_date', '')
-                    first_album_released = min(album['release_date'] for album in albums)
-                    if not debut_date or debut_date > first_album_released:
-                        artist['debut_date'] = first_album_released
-                        save_success = await save_artist(artist)
-                        if save_success:
-                            logger.info(f"Updated debut date for artist {artist_id} to {first_album_released}")
-                        else:
-                            logger.error(f"Failed to update debut date for artist {artist_id}")
-
-                    logger.info(f"Artist Debut Date {debut_date}, First Album Released {first_album_released}")
+                artist = dict(artist) if artist else None
+                if artist and update_debut_date(artist, albums):
+                    save_success = await save_artist(artist)
+                    if save_success:
+                        logger.info(f"Updated debut date for artist {artist_id} to {artist['debut_date']}")
+                    else:
+                        logger.error(f"Failed to update debut date for artist {artist_id}")
             else:
                 logger.error(f"Failed to save {len(albums)} Albums")
         else:
@@ -56,80 +70,218 @@ async def crawling_albums(artist_id: str):
 
 async def crawling_songs(artist_id: str):
     try:
-        songs_response = await get_songs(artist_id)
-        if songs_response:
-            songs = songs_response['songs']
-            success = await save_songs(songs)
-            if success:
-                logger.info(f"{len(songs)} Songs Saved!")
-            else:
-                logger.error(f"Failed to save {len(songs)} Songs")
-        else:
+        saved, failed = await stream_to_store(iter_songs(artist_id), save_songs)
+        if saved:
+            logger.info(f"{saved} Songs Saved!")
+        if failed:
+            logger.error(f"Failed to save {failed} Songs")
+        elif not saved:
             logger.error(f"Failed to get songs for {artist_id}")
     except Exception as e:
         logger.error(f"Exception : {str(e)}")
 
 async def crawling_videos(artist_id: str):
     try:
-        videos = await get_videos(artist_id)
-        for video in videos:
-            logger.info(f"VIDEO! {video}")
-        if videos:
-            success = await save_videos(videos)
-            logger.info(f"Video SAVE Success?? {success}")
-            if success:
-                logger.info(f"{videos.get('artist_name')} Saved!")
-            else:
-                logger.error(f"Failed to save {videos.get('artist_name')}")
-        else:
-            logger.error(f"Failed to get artist information from {artist_id}")
+        saved, failed = await stream_to_store(iter_videos(artist_id), save_videos)
+        if saved:
+            logger.info(f"{saved} Videos Saved!")
+        if failed:
+            logger.error(f"Failed to save {failed} Videos")
+        elif not saved:
+            logger.error(f"Failed to get videos for {artist_id}")
     except Exception as e:
         logger.error(f"Exception : {str(e)}")
 
 async def crawling_photos(artist_id: str):
     try:
-        photos = await get_photos(artist_id)
-        if photos:
-            success = await save_photos(photos)
-            if success:
-                logger.info(f"{photos.get('artist_name')} Saved!")
-            else:
-                logger.error(f"Failed to save {photos.get('artist_name')}")
-        else:
-            logger.error(f"Failed to get artist information from {artist_id}")
+        saved, failed = await stream_to_store(iter_photos(artist_id), save_photos)
+        if saved:
+            logger.info(f"{saved} Photos Saved!")
+        if failed:
+            logger.error(f"Failed to save {failed} Photos")
+        elif not saved:
+            logger.error(f"Failed to get photos for {artist_id}")
     except Exception as e:
         logger.error(f"Exception : {str(e)}")
 
+async def collect_comments(artist_id: str, albums: list) -> int:
+    collected_albums = 0
+    failed = 0
+
+    # 앨범별로 마지막으로 저장한 댓글 이후의 새 댓글만 수집 (처음 수집하는 앨범은 전체 수집)
+    # 수집 기준을 읽지 못하면 전체를 다시 수집하지 않고 오류를 그대로 전달 (작업이 실패하고 다음 갱신에서 다시 시도)
+    watermarks = await load_comment_watermarks(artist_id)
+
+    album_semaphore = asyncio.Semaphore(COMMENT_ALBUM_CONCURRENCY)
+
+    # 앨범별로 받는 대로 일정 개수씩 저장해 댓글 전체를 메모리에 들고 있지 않도록 함
+    # 한 번에 COMMENT_ALBUM_CONCURRENCY개 앨범만 수집
+    async def collect_album_comments(album):
+        async with album_semaphore:
+            await collect_one_album(album)
+
+    async def collect_one_album(album):
+        nonlocal collected_albums, failed
+        since_seq = watermarks.get(album['id'])
+        newest = None
+
+        async def track_newest(comments):
+            nonlocal newest
+            try:
+                async for comment in comments:
+                    if newest is None or int(comment['id']) > int(newest['id']):
+                        newest = comment
+                    yield comment
+            finally:
+                await comments.aclose()
+
+        # 페이지 조회가 실패하면 그 전까지 받은 댓글만 저장되므로 앨범을 실패로 보고 수집 기준을 갱신하지 않음
+        # (다음 수집에서 이전 기준부터 다시 가져옴)
+        try:
+            saved, failed_comments = await stream_to_store(
+                track_newest(iter_comments(artist_id, album['id'], since_seq)), save_comments
+            )
+        except Exception as e:
+            failed += 1
+            logger.error(f"Failed to crawl comments for Album {album['id']}: {str(e)}")
+            return
+        finally:
+            collected_albums += 1
+            report_progress("albums", collected_albums, len(albums))
+
+        if failed_comments:
+            failed += 1
+            logger.error(f"Failed to save {failed_comments} Comments for Album {album['id']}")
+        elif saved:
+            logger.info(f"{saved} Comments Saved for Album {album['id']}")
+            # 모든 댓글이 저장된 경우에만 다음 수집 기준을 갱신
+            await save_comment_watermark(artist_id, album['id'], int(newest['id']), newest['display_date'])
+        elif since_seq is None:
+            logger.error(f"Failed to get comments for Album {album['id']}")
+
+    await asyncio.gather(*(collect_album_comments(album) for album in albums))
+    return failed
+
 async def crawling_comments(artist_id: str):
+    failed = 0
     try:
         albums = await bring_albums(artist_id)
         logger.info(f"Albums for Comments : {albums}")
         if albums:
-            all_comments = []
-            
-            # 병렬로 댓글 수집
-            tasks = [get_comments(artist_id, album['id']) for album in albums]
-            all_comments_responses = await asyncio.gather(*tasks)
-
-            for album, comments in zip(albums, all_comments_responses):
-                if comments:
-                    all_comments.append(comments)
-                    success = await save_comments(comments)
-                    if success:
-                        logger.info(f"{len(comments)} Comments Saved for Album {album.id}")
-                    else:
-                        logger.error(f"Failed to save {len(comments)} Comments for Album {album.id}")
-                else:
-                    logger.error(f"Failed to get comments for Album {album.id}")
+            failed = await collect_comments(artist_id, albums)
         else:
             logger.error(f"Failed to get albums for artist {artist_id}")
     except Exception as e:
         logger.error(f"Exception: {str(e)}")
+        raise
+
+    # 일부 앨범의 댓글을 다 받지 못했으면 작업을 실패로 표시
+    if failed:
+        raise RuntimeError(f"Failed to collect comments for {failed} Albums")
 
+# 단계별 선행 단계가 끝나면 실행하는 DAG 실행기
+# stages: {단계 이름: (선행 단계 목록, 선행 단계 결과 dict를 받는 코루틴 함수[, 선택 선행 단계 목록])}
+# 선행 단계가 실패하면 건너뛰고, 선택 선행 단계는 끝날 때까지 기다리기만 함 (실패하면 결과 dict에 없음)
+async def run_pipeline(stages: dict) -> dict:
+    results = {}
+    stage_info = {name: {"status": "pending", "elapsed": None} for name in stages}
+    finished = 0
+
+    async def run_stage(name):
+        nonlocal finished
+        deps, stage_func, *optional = stages[name]
+        optional_deps = optional[0] if optional else []
+        await asyncio.gather(*(stage_tasks[dep] for dep in [*deps, *optional_deps]), return_exceptions=True)
+
+        failed_deps = [dep for dep in deps if stage_info[dep]["status"] != "completed"]
+        if failed_deps:
+            stage_info[name]["status"] = "skipped"
+        else:
+            stage_info[name]["status"] = "in_progress"
+            report_progress("stages", finished, len(stages), stages=stage_info)
+            started = time.monotonic()
+            try:
+                results[name] = await stage_func(results)
+                stage_info[name]["status"] = "completed"
+            except Exception as e:
+                stage_info[name]["status"] = "failed"
+                stage_info[name]["error"] = str(e)
+                logger.error(f"Stage {name} failed: {str(e)}")
+            stage_info[name]["elapsed"] = round(time.monotonic() - started, 3)
 
-async def bring_artist(artist_id: str):
+        finished += 1
+        report_progress("stages", finished, len(stages), stages=stage_info)
+
+    stage_tasks = {name: asyncio.create_task(run_stage(name)) for name in stages}
+    await asyncio.gather(*stage_tasks.values())
+
+    unfinished = [name for name, info in stage_info.items() if info["status"] != "completed"]
+    if unfinished:
+        raise RuntimeError(f"Pipeline stages not completed: {', '.join(unfinished)}")
+    return stage_info
+
+# 아티스트 전체 크롤링: 독립 단계는 동시에 실행하고, 의존 단계는 선행 결과를 메모리에서 전달받음
+async def crawling_artist_all(artist_id: str):
+    url = artist_url(artist_id)
+
+    async def artist_stage(results):
+        artist_info = await get_artist_info(url)
+        if not artist_info:
+            raise ValueError(f"Failed to get artist information from {url}")
+        return artist_info
+
+    async def albums_stage(results):
+        albums = await get_albums(artist_id)
+        if albums and not await save_albums(albums):
+            raise RuntimeError(f"Failed to save {len(albums)} Albums")
+        return albums
+
+    # 앨범 단계가 실패해도 아티스트 정보는 저장하고, 데뷔일은 앨범을 받은 경우에만 갱신
+    async def save_artist_stage(results):
+        artist_info = results['artist']
+        if results.get('albums'):
+            update_debut_date(artist_info, results['albums'])
+        if not await save_artist(artist_info):
+            raise RuntimeError(f"Failed to save {artist_info.get('artist_name')}")
+
+    async def songs_stage(results):
+        saved, failed = await stream_to_store(iter_songs(artist_id), save_songs)
+        if failed:
+            raise RuntimeError(f"Failed to save {failed} Songs")
+        return saved
+
+    async def videos_stage(results):
+        saved, failed = await stream_to_store(iter_videos(artist_id), save_videos)
+        if failed:
+            raise RuntimeError(f"Failed to save {failed} Videos")
+        return saved
+
+    async def photos_stage(results):
+        saved, failed = await stream_to_store(iter_photos(artist_id), save_photos)
+        if failed:
+            raise RuntimeError(f"Failed to save {failed} Photos")
+        return saved
+
+    async def comments_stage(results):
+        failed = await collect_comments(artist_id, results['albums'] or [])
+        if failed:
+            raise RuntimeError(f"Failed to save comments for {failed} Albums")
+
+    stages = {
+        'artist': ([], artist_stage),
+        'albums': ([], albums_stage),
+        'save_artist': (['artist'], save_artist_stage, ['albums']),
+        'songs': ([], songs_stage),
+        'videos': ([], videos_stage),
+        'photos': ([], photos_stage),
+        'comments': (['albums'], comments_stage),
+    }
+    stage_info = await run_pipeline(stages)
+    logger.info(f"Artist {artist_id} pipeline finished: {stage_info}")
+
+async def bring_artist(artist_id: str, fields=None):
     try:
-        artist_info = await load_artist(artist_id)
+        artist_info = await load_artist(artist_id, fields)
         if artist_info:
             logger.info(f"{artist_info.get('artist_name')} Loaded!")
             return artist_info
@@ -140,9 +292,9 @@ async def bring_artist(artist_id: str):
         logger.error(f"Connection failed to load {artist_id}")
         return None
     
-async def bring_albums(artist_id: str):
+async def bring_albums(artist_id: str, fields=None):
     try:
-        albums = await load_artist_albums(artist_id)
+        albums = await load_artist_albums(artist_id, fields)
         if albums:
             logger.info(f"{len(albums)} Loaded!")
             return albums
@@ -153,9 +305,9 @@ async def bring_albums(artist_id: str):
         logger.error(f"Connection failed to load {artist_id} Albums")
         return None    
 
-async def bring_songs(artist_id: str):
+async def bring_songs(artist_id: str, fields=None):
     try:
-        songs = await load_artist_songs(artist_id)
+        songs = await load_artist_songs(artist_id, fields)
         if songs:
             logger.info(f"{len(songs)} Loaded!")
             return songs
@@ -166,9 +318,9 @@ async def bring_songs(artist_id: str):
         logger.error(f"Connection failed to load {artist_id} Songs")
         return None
     
-async def bring_videos(artist_id: str):
+async def bring_videos(artist_id: str, fields=None):
     try:
-        videos = await load_artist_videos(artist_id)
+        videos = await load_artist_videos(artist_id, fields)
         if videos:
             logger.info(f"{len(videos)} Loaded!")
             return videos
@@ -179,9 +331,9 @@ async def bring_videos(artist_id: str):
         logger.error(f"Connection failed to load {artist_id} Videos")
         return None 
 
-async def bring_photos(artist_id: str):
+async def bring_photos(artist_id: str, fields=None):
     try:
-        photos = await load_artist_photos(artist_id)
+        photos = await load_artist_photos(artist_id, fields)
         if photos:
             logger.info(f"{len(photos)} Loaded!")
             return photos
@@ -192,9 +344,9 @@ async def bring_photos(artist_id: str):
         logger.error(f"Connection failed to load {artist_id} Photos")
         return None  
     
-async def bring_album_comments(album_id: str):
+async def bring_album_comments(album_id: str, fields=None):
     try:
-        comments = await load_album_comments(album_id)
+        comments = await load_album_comments(album_id, fields)
         if comments:
             logger.info(f"{len(comments)} Loaded for Album({album_id})!")
             return comments
@@ -205,9 +357,9 @@ async def bring_album_comments(album_id: str):
         logger.error(f"Connection failed to load Album({album_id}) Comments")
         return None
     
-async def bring_artist_comments(artist_id: str):
+async def bring_artist_comments(artist_id: str, fields=None):
     try:
-        comments = await load_artist_comments(artist_id)
+        comments = await load_artist_comments(artist_id, fields)
         if comments:
             logger.info(f"{len(comments)} Loaded for Artist({artist_id})!")
             return comments
@@ -218,11 +370,11 @@ async def bring_artist_comments(artist_id: str):
         logger.error(f"Connection failed to load Artist({artist_id}) Comments")
         return None
     
-async def bring_latest_comments(artist_id: str):
+async def bring_latest_comments(artist_id: str, fields=None):
     try:
-        comments = await load_latest_comments(artist_id)
+        comments = await load_latest_comments(artist_id, fields)
         if comments:
-            logger.info(f"Latest comment for Artist({artist_id}) : {comments[0]['updatedAt']}({len(comments)} comments)")
+            logger.info(f"Latest comment for Artist({artist_id}) : {comments[0].get('updatedAt')}({len(comments)} comments)")
             return comments
         logger.error(f"Failed to load Artist({artist_id}) Latest Comment")
         return None
@@ -230,9 +382,9 @@ async def bring_latest_comments(artist_id: str):
         logger.error(f"Connection failed to load Artist({artist_id}) Latest Comment")
         return None
     
-async def bring_all_artists():
+async def bring_all_artists(fields=None):
     try:
-        artists = await load_all_artists()
+        artists = await load_all_artists(fields)
         if artists:
             logger.info(f"{len(artists)} Artists have been Loaded!")
             return artists
@@ -241,61 +393,3 @@ async def bring_all_artists():
     except Exception as e:
         logger.error(f"Connection failed to load artists")
         return None
-    
-from collections import Counter
-from typing import Any, List, Dict
-from konlpy.tag import Okt
-from sklearn.feature_extraction.text import TfidfVectorizer
-
-def process_keywords(comments: List[Dict[str, Any]], min_frequency: int = 2, min_tfidf = 0.1) -> dict: 
-    okt = Okt()
-    
-    # 사전에 정의된 불용어 리스트
-    custom_stopwords = set([
-        "하다", "있다", "되다", "이다", "않다", "없다", "같다", "보다", "가다", "오다", "많다",  # 불용어
-        "또", "요", "오", "제", "내", "스", "그", "스원", "눈", "나", "것", "원님" # 추가 불필요 단어
-    ])
-
-    def extract_keywords(text: str) -> List[str]:
-        # 텍스트를 형태소 분석하고 명사와 형용사를 추출
-        morphs = okt.pos(text, stem=True)
-        keywords = [word for word, pos in morphs if pos in ['Noun', 'Adjective']]
-        return keywords
-    
-    all_keywords = []
-
-    # 각 댓글을 개별적으로 처리
-    for comment_dict in comments:
-        comment = comment_dict["content"]  # 딕셔너리에서 실제 댓글 내용 추출
-        keywords = extract_keywords(comment)
-        all_keywords.extend(keywords)
-
-    # 길이가 1 이하인 단어를 자동 불용어로 추가
-    auto_stopwords = set(word for word in all_keywords if len(word) <= 1)
-    all_stopwords = custom_stopwords.union(auto_stopwords)
-    
-    def filter_keywords(keywords: List[str], stopwords: set) -> List[str]:
-        # 불용어를 제외한 키워드 필터링
-        filtered_keywords = [word for word in keywords if word not in stopwords]
-        return filtered_keywords
-    
-    filtered_keywords = filter_keywords(all_keywords, all_stopwords)
-
-    # TF-IDF 벡터화
-    vectorizer = TfidfVectorizer()
-    comment_texts = [comment_dict["content"] for comment_dict in comments]  # TF-IDF 적용을 위한 댓글 리스트
-    X = vectorizer.fit_transform(comment_texts)
-
-    # TF-IDF 값이 높은 키워드 필터링
-    tfidf_scores = dict(zip(vectorizer.get_feature_names_out(), X.sum(axis=0).tolist()[0]))
-    tfidf_filtered_keywords = [word for word in filtered_keywords if tfidf_scores.get(word, 0) >= min_tfidf]
-        
-    def calculate_keyword_frequencies(keywords: List[str], min_frequency: int) -> dict:
-        # 최종적으로 필터링된 키워드의 빈도 계산
-        counter = Counter(keywords)
-        filtered_counter = {word: freq for word, freq in counter.items() if freq >= min_frequency}
-        return filtered_counter
-    
-    keyword_frequencies = calculate_keyword_frequencies(tfidf_filtered_keywords, min_frequency)
-    return keyword_frequencies
-